@@ -0,0 +1,206 @@
+"""AI helpers: prompts, cached completions and streamed completions.
+
+Kept free of Streamlit so the same helpers can be benchmarked or reused
+from scripts. The app calls ``configure`` once with factories for the
+shared ``ResilientClient`` and ``LLMCache``; each is built once per process,
+by whichever thread first needs it (often an explanation worker), so the
+factories must not need a Streamlit script context.
+"""
+import threading
+import time
+
+from llm_cache import cache_key
+from llm_client import LLMUnavailable
+from llm_scheduler import CHAT, EXPLAIN, POLICY
+from metrics import METRICS, record_usage
+from singleflight import SINGLE_FLIGHT
+from streaming import iter_deltas, timed_stream
+
+AI_MODEL = "gpt-4o-mini"
+
+FALLBACK_REPLY = (
+    "⚠️ I’m unable to respond right now.\n\n"
+    "Please follow your hospital medication policy."
+)
+
+_client_factory = None
+_cache_factory = None
+_client = None
+_cache = None
+_lock = threading.Lock()
+
+
+def configure(client_factory, cache_factory):
+    global _client_factory, _cache_factory, _client, _cache
+    with _lock:
+        _client_factory, _cache_factory = client_factory, cache_factory
+        _client = _cache = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = _client_factory()
+    return _client
+
+
+def get_llm_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = _cache_factory()
+    return _cache
+
+
+# =========================
+# Completions
+# =========================
+def cached_completion(prompt, call, priority=EXPLAIN):
+    computed = False
+
+    def compute():
+        nonlocal computed
+        computed = True
+        # Sessions missing the cache for the same prompt at once share one request
+        return SINGLE_FLIGHT.call(cache_key(AI_MODEL, prompt), request, call)
+
+    def request():
+        started = time.perf_counter()
+        try:
+            response = get_client().create(
+                model=AI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.0,
+                priority=priority
+            )
+        finally:
+            METRICS.observe("llm_call_seconds", time.perf_counter() - started, call=call)
+        record_usage(call, getattr(response, "usage", None))
+        return response.choices[0].message.content
+    try:
+        text = get_llm_cache().get_or_compute(AI_MODEL, prompt, compute)
+    except LLMUnavailable:
+        METRICS.inc("llm_errors_total", call=call)
+        return FALLBACK_REPLY
+    METRICS.inc("llm_cache_misses_total" if computed else "llm_cache_hits_total", call=call)
+    return text
+
+def with_fallback(stream, call):
+    # Failed answers end with the fallback text and are never cached
+    started = time.perf_counter()
+    try:
+        yield from stream
+    except Exception:
+        METRICS.inc("llm_errors_total", call=call)
+        yield FALLBACK_REPLY
+    finally:
+        METRICS.observe("llm_call_seconds", time.perf_counter() - started, call=call)
+
+def stream_completion(prompt, label, messages=None, temperature=0.0, use_cache=True, priority=EXPLAIN):
+    """Stream a completion for st.write_stream; cached answers replay instantly."""
+    cache = get_llm_cache() if use_cache else None
+    if cache:
+        cached = cache.get(AI_MODEL, prompt)
+        if cached is not None:
+            METRICS.inc("llm_cache_hits_total", call=label)
+            return timed_stream(lambda: [cached], label, cached=True)
+        METRICS.inc("llm_cache_misses_total", call=label)
+
+    def open_stream():
+        response = get_client().create(
+            model=AI_MODEL,
+            messages=messages or [{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            priority=priority
+        )
+        return iter_deltas(response, on_usage=lambda usage: record_usage(label, usage))
+
+    if not cache:
+        return with_fallback(timed_stream(open_stream, label), label)
+
+    def open_shared_stream():
+        return SINGLE_FLIGHT.stream(cache_key(AI_MODEL, prompt), open_stream, label)
+
+    on_complete = lambda text: cache.set(AI_MODEL, prompt, text)
+    return with_fallback(timed_stream(open_shared_stream, label, on_complete=on_complete), label)
+
+
+# =========================
+# Helpers used by the UI
+# =========================
+def ask_ai_prompt(drug, result, tip, calculation_type):
+    return f"""
+You are an ICU clinical assistant.
+Calculation type: {calculation_type}
+Drug/Fluid: {drug}
+Result: {result}
+Clinical tip: {tip}
+Explain clearly how this result is interpreted clinically.
+Mention safety considerations.
+Do NOT use formulas or code.
+"""
+
+def ask_ai(drug, result, tip, calculation_type, priority=EXPLAIN):
+    return cached_completion(ask_ai_prompt(drug, result, tip, calculation_type), "ask_ai", priority)
+
+def ask_ai_stream(drug, result, tip, calculation_type, priority=EXPLAIN):
+    return stream_completion(ask_ai_prompt(drug, result, tip, calculation_type), "ask_ai", priority=priority)
+
+
+def med_policy_prompt(drug_name):
+    return f"""
+You are an ICU clinical assistant.
+Provide a detailed medication policy for: {drug_name}
+Include:
+- Clinical safety considerations
+- Preparation guidance
+- Administration tips
+- Monitoring
+Do NOT provide dose calculations.
+"""
+
+def generate_med_policy(drug_name):
+    return cached_completion(med_policy_prompt(drug_name), "generate_med_policy", POLICY)
+
+def generate_med_policy_stream(drug_name):
+    return stream_completion(med_policy_prompt(drug_name), "generate_med_policy", priority=POLICY)
+
+
+def chat_prompt(user_prompt, tip, excerpts=()):
+    """``excerpts`` is a sequence of (citation, passage text) pairs."""
+    policy_text = "\n\n".join(f"[{citation}] {text}" for citation, text in excerpts) or "None found."
+    return f"""
+You are an ICU Nurse Assistant.
+
+User question:
+{user_prompt}
+
+Clinical tip (if relevant):
+{tip}
+
+Hospital policy excerpts (base your answer on these and cite them in brackets, e.g. [MM 5.4 p.3]):
+{policy_text}
+
+Respond like a real clinical assistant:
+- Clear
+- Professional
+- Nursing-focused
+- Safety-oriented
+
+Do NOT calculate doses.
+Always remind to follow hospital policy and local guidelines.
+"""
+
+def chat_reply_stream(user_prompt, tip, excerpts=(), summary="", history=()):
+    # Chat runs at temperature 0.3, so its answers are not cached
+    messages = [{"role": "system", "content": "You are a professional ICU nurse assistant."}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    messages += list(history)
+    messages.append({"role": "user", "content": chat_prompt(user_prompt, tip, excerpts)})
+    return stream_completion(None, "chat", messages=messages, temperature=0.3, use_cache=False, priority=CHAT)
@@ -1,10 +1,40 @@
 import os
+import time
+import uuid
 from pathlib import Path
+
+# Taken before the imports so a cold start's first run includes them
+script_started = time.perf_counter()
+
 import streamlit as st
-from openai import OpenAI
 
-api_key = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
+import ai
+from ai import FALLBACK_REPLY, ask_ai_stream, chat_reply_stream, generate_med_policy_stream
+from audit_log import AuditLog
+from chat_memory import ChatMemory
+from drug_catalog import default_catalog, preparation_label
+from engine import (
+    calculate_infusion,
+    calculate_parenteral,
+    calculate_oral,
+    calculate_tablet,
+    calculate_iv_gravity,
+    calculate_iv_pump,
+)
+from explain_pool import ExplanationPool
+from llm_cache import LLMCache
+from llm_client import ResilientClient, build_openai_client
+from llm_scheduler import EXPLAIN, INOTROPE, LLMScheduler
+from metrics import METRICS, serve_prometheus, start_jsonl_export
+from policy_index import PolicyIndex
+from policy_retrieval import PolicyRetriever
+from rate_chart import chart_csv, chart_frame, concentrations_for, rate_chart
+from rerun_timing import FULL_SCRIPT, RERUN_STATS, timed_fragment
+from similarity_cache import DEFAULT_THRESHOLD, SimilarityCache
+from startup_profile import record_first_paint
+from streaming import STREAM_STATS
+from units import compatible
+from ward_schedule import WardSchedule, rate_ml_per_hour
 
 # =========================
 # App Config
@@ -35,122 +65,184 @@ HOSPITAL_POLICIES = {
 }
 
 # =========================
-# Drug Database
+# Drug catalog (drug_catalog.json, reloaded when the file changes)
 # =========================
-DRUGS = {
-    "Dopamine": {"type": "inotrope"},
-    "Dobutamine": {"type": "inotrope"},
-    "Epinephrine": {"type": "inotrope"},
-    "Fentanyl": {"type": "sedative"},
-    "Propofol": {"type": "sedative"},
-    "Midazolam": {"type": "sedative"},
-    "Esmron or Rocuronium": {"type": "muscle_relaxant"},
-    "Atracurium": {"type": "muscle_relaxant"}
-}
-
-TIME_MANDATORY_DRUGS = ["Dopamine", "Dobutamine", "Epinephrine"]
-
-drug_tips = {
-    "dopamine": "Ensure IV access is patent and monitor blood pressure closely.",
-    "dobutamine": "Titrate gradually according to cardiac output and BP.",
-    "epinephrine": "Prefer central line; peripheral acceptable short-term in emergencies.",
-    "fentanyl": "Use 2 ampules (1000 mcg) + 30–40 mL NS in a 50 mL syringe.",
-    "propofol": "Use 2 ampules (400 mg) = 40 ml in a 50 mL syringe.",
-    "midazolam": "Use 3 ampules (45 mg): 9 mL drug + 36 mL NS → total 45 mg in 45 mL.",
-    "rocuronium": "Ensure adequate sedation before paralysis. Use 5 ampules = 250 mg in 50 mL.",
-    "esmron": "Same preparation as Rocuronium. Ensure adequate sedation before paralysis. Use 5 ampules = 250 mg in 50 mL.",
-    "atracurium": "Watch for hypotension and histamine release. Use 4 ampules (100 mg) + 40 mL NS.",
-    "other": "Ensure dose and stock use the same units.",
-    "Caution": "🛑Always follow up your hospital policies and procedures🛑"
-
-}
+drug_catalog = default_catalog()
+
+def medication_tip(catalog, med, default):
+    """Tip for a typed medication name, noting which catalog entry it matched."""
+    if not med.strip():
+        return default
+    entry = catalog.lookup(med)
+    if entry is None:
+        suggestions = catalog.complete(med, limit=3)
+        if suggestions:
+            st.caption(f"Did you mean: {', '.join(suggestions)}?")
+        return default
+    if entry.name.lower() != med.strip().lower():
+        st.caption(f"📖 Catalog match: {entry.name}")
+    return entry.tip or default
 
 # =========================
 # AI Functions (fixed)
 # =========================
-def ask_ai(drug, result, tip, calculation_type):
-    prompt = f"""
-You are an ICU clinical assistant.
-Calculation type: {calculation_type}
-Drug/Fluid: {drug}
-Result: {result}
-Clinical tip: {tip}
-Explain clearly how this result is interpreted clinically.
-Mention safety considerations.
-Do NOT use formulas or code.
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0
+def build_client():
+    # Built once per process (by ai) so the connection pool survives reruns
+    api_key = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY")
+    # One queue for every session: concurrency cap, rate limit and priorities
+    scheduler = LLMScheduler(
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        rate=float(os.getenv("LLM_RATE_PER_SECOND", "8")),
+        burst=int(os.getenv("LLM_BURST", "16")),
+    )
+    return ResilientClient(build_openai_client(api_key), scheduler=scheduler)
+
+@st.cache_resource
+def configure_ai():
+    # Once per process. The client and the on-disk cache are built on first use,
+    # often in an explanation worker thread, so their factories are plain functions
+    ai.configure(build_client, LLMCache)
+    return True
+
+configure_ai()
+
+@st.cache_resource
+def get_chat_cache():
+    # Answers to earlier Nurse Assistant questions, shared by every session
+    return SimilarityCache(threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", DEFAULT_THRESHOLD)))
+
+@st.cache_resource
+def start_metrics_export():
+    # Once per process: Prometheus scrape endpoint and/or periodic JSONL snapshots
+    if os.getenv("METRICS_PORT"):
+        serve_prometheus(int(os.getenv("METRICS_PORT")))
+    if os.getenv("METRICS_JSONL_PATH"):
+        start_jsonl_export(os.getenv("METRICS_JSONL_PATH"), float(os.getenv("METRICS_JSONL_INTERVAL", "60")))
+    return True
+
+start_metrics_export()
+
+
+@st.cache_resource
+def get_audit_log():
+    # One write-behind writer per process; AUDIT_LOG_PATH may be shared by several workers
+    return AuditLog()
+
+def audit_session():
+    if "audit_session" not in st.session_state:
+        st.session_state.audit_session = uuid.uuid4().hex
+    return st.session_state.audit_session
+
+def audited(tab, func, *args, **kwargs):
+    """Run a calculator and append its inputs, result and latency to the audit log."""
+    return get_audit_log().call(tab, audit_session(), func, *args, **kwargs)
+
+def audit_ai_response(call, text, tab=""):
+    get_audit_log().ai_response(call, text, tab, audit_session())
+
+
+@st.cache_resource
+def get_explain_pool():
+    # Bounded worker pool shared by every session
+    return ExplanationPool()
+
+def explain_in_background(slot, inputs, drug, result, tip, calculation_type, priority=EXPLAIN):
+    """Queue the AI explanation of a result; the calculator never waits on it."""
+    previous = st.session_state.get(slot)
+    if previous is not None:
+        previous.cancel()
+    st.session_state[slot] = get_explain_pool().submit(
+        inputs, result, ask_ai_stream(drug, result, tip, calculation_type, priority)
     )
-    return response.choices[0].message.content
-
-
-def generate_med_policy(drug_name):
-    prompt = f"""
-You are an ICU clinical assistant.
-Provide a detailed medication policy for: {drug_name}
-Include:
-- Clinical safety considerations
-- Preparation guidance
-- Administration tips
-- Monitoring
-Do NOT provide dose calculations.
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0
+
+def show_explanation(slot, inputs):
+    job = st.session_state.get(slot)
+    if job is None:
+        return
+    if job.inputs != inputs:
+        # Inputs changed since the calculation: the explanation no longer applies
+        job.cancel()
+        del st.session_state[slot]
+    elif job.done:
+        finish_explanation(slot, job)
+    else:
+        poll_explanation(slot)
+
+def render_explanation(job):
+    st.caption(f"🤖 AI explanation for {job.headline}")
+    st.markdown(FALLBACK_REPLY if job.error else job.text)
+
+def finish_explanation(slot, job):
+    # Audited once per finished explanation, not on every rerun that shows it
+    if st.session_state.get(f"{slot}_audited") is not job:
+        st.session_state[f"{slot}_audited"] = job
+        audit_ai_response("ask_ai", FALLBACK_REPLY if job.error else job.text, slot.rsplit("_", 1)[-1])
+    render_explanation(job)
+
+@st.fragment(run_every=0.5)
+def poll_explanation(slot):
+    job = st.session_state.get(slot)
+    if job is None:
+        return
+    if job.done:
+        # Shown in place: st.rerun() here would rerun every tab and the chat
+        finish_explanation(slot, job)
+        return
+    render_explanation(job)
+    st.caption("⏳ AI explanation loading…")
+
+
+def show_rate_chart(drug):
+    concentrations = concentrations_for(drug)
+    if not concentrations:
+        st.info("No standard preparation in the drug catalog for this drug.")
+        return
+    concentration = st.selectbox("Standard concentration (MM 5.4)", concentrations, key=f"A_chart_conc_{drug}")
+    doses, weights, _ = rate_chart(concentration)
+    dose_range = st.slider(
+        "Dose range (mcg/kg/min)", float(doses[0]), float(doses[-1]),
+        (float(doses[0]), float(doses[-1])), step=float(doses[1] - doses[0]), key=f"A_chart_doses_{concentration}"
+    )
+    weight_range = st.slider(
+        "Weight range (kg)", float(weights[0]), float(weights[-1]),
+        (float(weights[0]), float(weights[-1])), step=float(weights[1] - weights[0]), key=f"A_chart_weights_{concentration}"
+    )
+    frame = chart_frame(concentration, dose_range, weight_range)
+    st.caption("Infusion rate in mL/hr")
+    st.dataframe(frame.round(2))
+    st.download_button(
+        "⬇️ Download chart (CSV)",
+        data=chart_csv(frame),
+        file_name=f"{concentration.replace(' ', '_')}_rate_chart.csv",
+        mime="text/csv",
+        key="A_chart_csv"
     )
-    return response.choices[0].message.content
 
 
-# =========================
-# Calculation Engine
-# =========================
-def calculate_infusion(drug, dose, weight, stock, volume, time_min=None):
-    if None in (dose, stock, volume):
-        return None, None
-    if drug in TIME_MANDATORY_DRUGS:
-        if None in (weight, time_min) or time_min <= 0:
-            return None, None
-        total_ml = (dose * weight * volume * time_min) / (stock * 1000)
-        return round(total_ml, 2), "mL (total)"
-    if not time_min:
-        return round((dose * volume) / stock, 2), "mL/hr"
-    return round((dose * volume * time_min) / stock, 2), "mL (total)"
-
-def calculate_parenteral(dose, stock, volume, weight=None):
-    return (dose * weight / stock) * volume if weight else (dose / stock) * volume
-
-def calculate_oral(dose, stock, volume, weight=None):
-    return (dose * weight / stock) * volume if weight else (dose / stock) * volume
-
-def calculate_tablet(dose, stock, dose_unit="mg", stock_unit="mg"):
-    if dose <= 0 or stock <= 0:
-        return None
-
-    # Convert grams → mg if needed
-    if dose_unit.lower() == "g":
-        dose *= 1000
-    if stock_unit.lower() == "g":
-        stock *= 1000
-
-    return dose / stock
-
-def calculate_iv_gravity(volume, drop_factor, time_value, time_unit="minutes"):
-    if time_value <= 0:
-        return None
-    time_min = time_value * 60 if time_unit == "hours" else time_value
-    return (volume * drop_factor) / time_min
-
-def calculate_iv_pump(volume, time_hours):
-    return volume / time_hours if time_hours > 0 else None
+@st.cache_resource
+def get_policy_index():
+    # Loaded from disk once per process; refresh() re-indexes changed PDFs only
+    return PolicyIndex(POLICY_DIR)
+
+@st.cache_resource
+def get_policy_retriever():
+    # Chunk vectors are memory-mapped once per process
+    return PolicyRetriever(get_policy_index())
+
+def policy_citation(pdf_name, page):
+    for policy_no, policy in HOSPITAL_POLICIES.items():
+        if policy["pdf"].name == pdf_name:
+            return f"{policy_no} p.{page}"
+    return f"{pdf_name} p.{page}"
+
+
+def show_policy_stream(drug_name, tab):
+    st.markdown(f"### 📄 AI-Generated Policy for {drug_name}")
+    audit_ai_response("generate_med_policy", st.write_stream(generate_med_policy_stream(drug_name)), tab)
 
 
 # =========================
-# Tabs A–F
+# Tabs A–H
 # =========================
 tabs = st.tabs([
     "A – ICU Infusions",
@@ -159,7 +251,8 @@ tabs = st.tabs([
     "D – Tablets",
     "E – IV rate drip",
     "F – IV rate Pump",
-    "G - Hospital Policy"
+    "G - Hospital Policy",
+    "H – Ward board"
 ])
 # Acknowledge checkbox
 ack = st.checkbox("✅ I acknowledge and will comply with hospital medication policies")
@@ -167,7 +260,8 @@ if not ack:
     st.warning("⚠️ Please acknowledge policy compliance to view documents.")
     st.stop()
 # --- Tab A – ICU Infusions ---
-with tabs[0]:
+@timed_fragment("A – ICU Infusions")
+def infusions_tab(catalog):
     st.header("A – ICU Infusions")
 
     # -------------------------
@@ -182,7 +276,7 @@ with tabs[0]:
     # Drug grid inside an expander
     # -------------------------
     with st.expander("💊 Select ICU Infusion Drug (💉)"):
-        drugs = TIME_MANDATORY_DRUGS + [d for d in DRUGS if d not in TIME_MANDATORY_DRUGS] + ["Other"]
+        drugs = catalog.icu_drugs + ["Other"]
         max_cols = 4
         rows = [drugs[i:i + max_cols] for i in range(0, len(drugs), max_cols)]
 
@@ -190,11 +284,12 @@ with tabs[0]:
             cols = st.columns(len(row), gap="small")
             for col, drug in zip(cols, row):
                 # Assign icon and color
-                if drug in TIME_MANDATORY_DRUGS:
+                entry = catalog.get(drug)
+                if entry and entry.time_mandatory:
                     icon, bg_color = "🔴", "#ffcccc"
-                elif DRUGS.get(drug, {}).get("type") == "sedative":
+                elif entry and entry.type == "sedative":
                     icon, bg_color = "🟢", "#ccffcc"
-                elif DRUGS.get(drug, {}).get("type") == "muscle_relaxant":
+                elif entry and entry.type == "muscle_relaxant":
                     icon, bg_color = "🔵", "#cce0ff"
                 elif drug == "Other":
                     icon, bg_color = "✨", "#ffe680"
@@ -215,19 +310,8 @@ with tabs[0]:
         drug = st.session_state.selected_drug
 
         # ---- Link tips correctly ----
-        tip_key_map = {
-            "Dopamine": "dopamine",
-            "Dobutamine": "dobutamine",
-            "Epinephrine": "epinephrine",
-            "Fentanyl": "fentanyl",
-            "Propofol": "propofol",
-            "Midazolam": "midazolam",
-            "Esmron or Rocuronium": "esmron",
-            "Atracurium": "atracurium",
-            "Other": "other"
-        }
-        tip_key = tip_key_map.get(drug, "other")
-        tip = drug_tips.get(tip_key, "No tip available")
+        entry = catalog.get(drug)
+        tip = entry.tip if entry and entry.tip else catalog.default_tip
         st.info(f"🩺 Tip: {tip}")
 
         # ---- Other drug: editable name ----
@@ -239,21 +323,28 @@ with tabs[0]:
         # =========================
         # CALCULATOR
         # =========================
-        if drug in TIME_MANDATORY_DRUGS:
-            dose = st.number_input("Dose (mcg/kg/min)", min_value=0.0, key="A_i_dose")
-            weight = st.number_input("Weight (kg)", min_value=0.0, key="A_i_weight")
-            stock = st.number_input("Stock (mg)", min_value=0.1, key="A_i_stock")
-            volume = st.number_input("Dilution volume (mL)", min_value=1.0, key="A_i_volume")
-            time_min = st.number_input("Time (minutes) *required*", min_value=1.0, key="A_i_time")
-
-            if st.button("Calculate ICU Infusion", key="A_i_calc"):
-                if not drug_name.strip():
-                    st.warning("Please enter the medication name.")
-                else:
-                    result, unit = calculate_infusion(drug, dose, weight, stock, volume, time_min)
-                    if result:
-                        st.success(f"{result} {unit}")
-                        st.markdown(ask_ai(drug_name, f"{result} {unit}", tip, "Inotrope infusion"))
+        if catalog.is_time_mandatory(drug):
+            mode = st.radio("Mode", ["Calculator", "Rate chart"], horizontal=True, key="A_i_mode")
+            if mode == "Rate chart":
+                inputs = None
+                show_rate_chart(drug)
+            else:
+                dose = st.number_input("Dose (mcg/kg/min)", min_value=0.0, key="A_i_dose")
+                weight = st.number_input("Weight (kg)", min_value=0.0, key="A_i_weight")
+                stock = st.number_input("Stock (mg)", min_value=0.1, key="A_i_stock")
+                volume = st.number_input("Dilution volume (mL)", min_value=1.0, key="A_i_volume")
+                time_min = st.number_input("Time (minutes) *required*", min_value=1.0, key="A_i_time")
+                inputs = (drug_name, dose, weight, stock, volume, time_min)
+
+                if st.button("Calculate ICU Infusion", key="A_i_calc"):
+                    with METRICS.timer("calculation", tab="A"):
+                        if not drug_name.strip():
+                            st.warning("Please enter the medication name.")
+                        else:
+                            result, unit = audited("A", calculate_infusion, drug, dose, weight, stock, volume, time_min)
+                            if result:
+                                st.success(f"{result} {unit}")
+                                explain_in_background("explain_A", inputs, drug_name, f"{result} {unit}", tip, "Inotrope infusion", INOTROPE)
 
         else:
             dose = st.number_input("Dose", min_value=0.0, key="A_o_dose")
@@ -264,18 +355,23 @@ with tabs[0]:
             volume = st.number_input("Dilution volume (mL)", min_value=1.0, key="A_o_volume")
             time_min = st.number_input("Time (minutes) – optional", min_value=0.0, value=0.0, key="A_o_time")
 
-            # Unit conversion
-            if dose_unit == "mg" and stock_unit == "mcg": dose *= 1000
-            if dose_unit == "mcg" and stock_unit == "mg": stock *= 1000
+            inputs = (drug_name, dose, dose_unit, weight, stock, stock_unit, volume, time_min)
 
             if st.button("Calculate ICU Infusion (Other)"):
-                if drug == "Other" and not drug_name.strip():
-                    st.warning("Please enter the medication name.")
-                else:
-                    result, unit = calculate_infusion(drug, dose, weight if weight>0 else None, stock, volume, time_min)
-                    if result:
-                        st.success(f"{result} {unit}")
-                        st.markdown(ask_ai(drug_name, f"{result} {unit}", tip, "ICU infusion"))
+                with METRICS.timer("calculation", tab="A"):
+                    if drug == "Other" and not drug_name.strip():
+                        st.warning("Please enter the medication name.")
+                    elif not compatible(dose_unit, stock_unit):
+                        st.error(f"⚠️ A dose in {dose_unit} cannot be converted to a stock in {stock_unit}.")
+                    else:
+                        result, unit = audited(
+                            "A", calculate_infusion, drug, dose, weight if weight>0 else None, stock, volume, time_min, dose_unit, stock_unit
+                        )
+                        if result:
+                            st.success(f"{result} {unit}")
+                            explain_in_background("explain_A", inputs, drug_name, f"{result} {unit}", tip, "ICU infusion")
+
+        show_explanation("explain_A", inputs)
 
         # =========================
         # AI Medication Policy
@@ -284,54 +380,69 @@ with tabs[0]:
             if drug == "Other" and not drug_name.strip():
                 st.warning("Please enter the medication name.")
             else:
-                policy_text = generate_med_policy(drug_name)
-                st.markdown(f"### 📄 AI-Generated Policy for {drug_name}\n{policy_text}")
+                show_policy_stream(drug_name, "A")
+
+with tabs[0]:
+    infusions_tab(drug_catalog)
 
 # Tab B – Parenteral
-with tabs[1]:
+@timed_fragment("B – Parenteral")
+def parenteral_tab(catalog):
     st.header("B – Parenteral (IV/IM/SC)")
     med = st.text_input("Medication name:", key="Bmed")
-    tip = drug_tips.get(med.lower(), "Follow standard parenteral protocol.")
+    tip = medication_tip(catalog, med, "Follow standard parenteral protocol.")
     dose = st.number_input("Dose:", 0.0, key="Bdose")
     stock = st.number_input("Stock:", 0.1, 50.0, key="Bstock")
     volume = st.number_input("Volume (mL):", 1.0, 50.0, key="Bvol")
     weight_input = st.text_input("Weight (kg) (optional):", key="Bweight")
     weight = float(weight_input) if weight_input else None
+    inputs = (med, dose, stock, volume, weight)
     if st.button("Calculate Parenteral", key="B_calc"):
-        result = calculate_parenteral(dose, stock, volume, weight)
-        if result:
-            st.success(f"{med}: {result:.2f} mL")
-            st.markdown(ask_ai(med, f"{result:.2f} mL", tip, "Parenteral injection"))
+        with METRICS.timer("calculation", tab="B"):
+            result = audited("B", calculate_parenteral, dose, stock, volume, weight)
+            if result:
+                st.success(f"{med}: {result:.2f} mL")
+                explain_in_background("explain_B", inputs, med, f"{result:.2f} mL", tip, "Parenteral injection")
+    show_explanation("explain_B", inputs)
     if st.button("Generate AI Medication Policy", key="B_policy"):
-        policy_text = generate_med_policy(med)
-        st.markdown(f"### 📄 AI-Generated Policy for {med}\n{policy_text}")
+        show_policy_stream(med, "B")
+
+with tabs[1]:
+    parenteral_tab(drug_catalog)
 
 # Tab C – Oral
-with tabs[2]:
+@timed_fragment("C – Oral")
+def oral_tab(catalog):
     st.header("C – Oral syrup / suspension")
     med = st.text_input("Medication name:", key="Cmed")
-    tip = drug_tips.get(med.lower(), "Follow oral administration guidelines.")
+    tip = medication_tip(catalog, med, "Follow oral administration guidelines.")
     dose = st.number_input("Dose:", 0.0, key="Cdose")
     stock = st.number_input("Stock:", 0.1, 50.0, key="Cstock")
     volume = st.number_input("Volume (mL):", 1.0, 50.0, key="Cvol")
     weight_input = st.text_input("Weight (kg) (optional):", key="Cweight")
     weight = float(weight_input) if weight_input else None
+    inputs = (med, dose, stock, volume, weight)
     if st.button("Calculate Oral", key="C_calc"):
-        result = calculate_oral(dose, stock, volume, weight)
-        if result:
-            st.success(f"{med}: {result:.2f} mL")
-            st.markdown(ask_ai(med, f"{result:.2f} mL", tip, "Oral syrup calculation"))
+        with METRICS.timer("calculation", tab="C"):
+            result = audited("C", calculate_oral, dose, stock, volume, weight)
+            if result:
+                st.success(f"{med}: {result:.2f} mL")
+                explain_in_background("explain_C", inputs, med, f"{result:.2f} mL", tip, "Oral syrup calculation")
+    show_explanation("explain_C", inputs)
     if st.button("Generate AI Medication Policy", key="C_policy"):
-        policy_text = generate_med_policy(med)
-        st.markdown(f"### 📄 AI-Generated Policy for {med}\n{policy_text}")
+        show_policy_stream(med, "C")
+
+with tabs[2]:
+    oral_tab(drug_catalog)
 
 # Tab D – Tablets
 
-with tabs[3]:
+@timed_fragment("D – Tablets")
+def tablets_tab(catalog):
     st.header("D – Tablets / Capsules")
 
     med = st.text_input("Medication name:", key="Dmed")
-    tip = drug_tips.get(med.lower(), "Follow tablet administration guidelines.")
+    tip = medication_tip(catalog, med, "Follow tablet administration guidelines.")
 
     dose = st.number_input("Prescribed dose:", min_value=0.0, key="Ddose")
     dose_unit = st.selectbox("Dose unit:", ["mg", "g"], key="Ddose_unit")
@@ -339,24 +450,30 @@ with tabs[3]:
     stock = st.number_input("Tablet strength:", min_value=0.1, key="Dstock")
     stock_unit = st.selectbox("Tablet strength unit:", ["mg", "g"], key="Dstock_unit")
 
+    inputs = (med, dose, dose_unit, stock, stock_unit)
     if st.button("Calculate Tablets", key="D_calc"):
-        result = calculate_tablet(dose, stock, dose_unit, stock_unit)
+        with METRICS.timer("calculation", tab="D"):
+            result = audited("D", calculate_tablet, dose, stock, dose_unit, stock_unit)
 
-        if result is not None:
-            st.success(f"{med}: {result:.2f} tablet(s) needed")
-            st.caption(f"Each tablet contains {stock} {stock_unit}")
+            if result is not None:
+                st.success(f"{med}: {result:.2f} tablet(s) needed")
+                st.caption(f"Each tablet contains {stock} {stock_unit}")
 
-            if result % 1 != 0:
-                st.warning("⚠️ Fractional tablets — verify tablet is safe to split/crush per hospital policy.")
+                if result % 1 != 0:
+                    st.warning("⚠️ Fractional tablets — verify tablet is safe to split/crush per hospital policy.")
 
-            st.markdown(ask_ai(med, f"{result:.2f} tablets", tip, "Tablet calculation"))
+                explain_in_background("explain_D", inputs, med, f"{result:.2f} tablets", tip, "Tablet calculation")
 
+    show_explanation("explain_D", inputs)
     if st.button("Generate AI Medication Policy", key="D_policy"):
-        policy_text = generate_med_policy(med)
-        st.markdown(f"### 📄 AI-Generated Policy for {med}\n{policy_text}")
+        show_policy_stream(med, "D")
+
+with tabs[3]:
+    tablets_tab(drug_catalog)
 
 # Tab E – IV Gravity
-with tabs[4]:
+@timed_fragment("E – IV rate drip")
+def iv_gravity_tab():
     st.header("E – IV infusion (gravity)")
     fluid = st.text_input("Fluid name:", key="Efluid")
     tip = "Follow gravity IV protocol."
@@ -364,38 +481,52 @@ with tabs[4]:
     drop_factor = st.number_input("Drop factor:", 1.0, key="Edrop")
     time_unit = st.selectbox("Time unit:", ["minutes","hours"], key="E_time_unit")
     time_value = st.number_input(f"Time ({time_unit}):", 0.01, key="E_time_value")
+    inputs = (fluid, volume, drop_factor, time_unit, time_value)
     if st.button("Calculate IV Gravity", key="E_calc"):
-        rate = calculate_iv_gravity(volume, drop_factor, time_value, time_unit)
-        if rate:
-            st.success(f"{fluid}: {rate:.1f} gtts/min")
-            st.markdown(ask_ai(fluid, f"{rate:.1f} gtts/min", tip, "IV gravity calculation"))
+        with METRICS.timer("calculation", tab="E"):
+            rate = audited("E", calculate_iv_gravity, volume, drop_factor, time_value, time_unit)
+            if rate:
+                st.success(f"{fluid}: {rate:.1f} gtts/min")
+                explain_in_background("explain_E", inputs, fluid, f"{rate:.1f} gtts/min", tip, "IV gravity calculation")
+    show_explanation("explain_E", inputs)
     if st.button("Generate AI Medication Policy", key="E_policy"):
-        policy_text = generate_med_policy(fluid)
-        st.markdown(f"### 📄 AI-Generated Policy for {fluid}\n{policy_text}")
+        show_policy_stream(fluid, "E")
+
+with tabs[4]:
+    iv_gravity_tab()
 
 # Tab F – IV Pump
-with tabs[5]:
+@timed_fragment("F – IV rate Pump")
+def iv_pump_tab():
     st.header("F – IV infusion (pump)")
     fluid = st.text_input("Fluid name:", key="Ffluid")
     tip = "Follow infusion pump protocol."
     volume = st.number_input("Total volume (mL):", 1.0, key="Fvol")
     time_hours = st.number_input("Time (hours):", 0.01, key="Ftime")
+    inputs = (fluid, volume, time_hours)
     if st.button("Calculate IV Pump", key="F_calc"):
-        rate = calculate_iv_pump(volume, time_hours)
-        if rate:
-            st.success(f"{fluid}: {rate:.1f} mL/hr")
-            st.markdown(ask_ai(fluid, f"{rate:.1f} mL/hr", tip, "IV pump calculation"))
+        with METRICS.timer("calculation", tab="F"):
+            rate = audited("F", calculate_iv_pump, volume, time_hours)
+            if rate:
+                st.success(f"{fluid}: {rate:.1f} mL/hr")
+                explain_in_background("explain_F", inputs, fluid, f"{rate:.1f} mL/hr", tip, "IV pump calculation")
+    show_explanation("explain_F", inputs)
     if st.button("Generate AI Medication Policy", key="F_policy"):
-        policy_text = generate_med_policy(fluid)
-        st.markdown(f"### 📄 AI-Generated Policy for {fluid}\n{policy_text}")
+        show_policy_stream(fluid, "F")
+
+with tabs[5]:
+    iv_pump_tab()
 
 # =========================
 # Tab G – Hospital Policies (PDF)
 # =========================
-# =========================
-# Tab G – Hospital Policies (PDF)
-# =========================
-with tabs[6]:
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_pdf(path, mtime_ns):
+    # mtime_ns is only part of the cache key: a replaced PDF is read again
+    return Path(path).read_bytes()
+
+@timed_fragment("G – Hospital Policy")
+def policies_tab(policies):
     st.header("🏥 Hospital Medication Policies")
     st.markdown(
         """
@@ -405,22 +536,155 @@ with tabs[6]:
         """
     )
 
-    # Iterate through all policies (no search)
-    for policy_no, policy in HOSPITAL_POLICIES.items():
+    # Full-text search (BM25) over every policy page
+    query = st.text_input("🔎 Search policies", placeholder="e.g. dopamine preparation, high alert", key="G_search")
+    if query.strip():
+        policy_index = get_policy_index()
+        policy_index.refresh()
+        hits = policy_index.search(query, limit=10)
+        policy_names = {p["pdf"].name: f"{no} – {p['title']}" for no, p in policies.items()}
+        if not hits:
+            st.info("No matching policy pages.")
+        for hit in hits:
+            st.markdown(f"**{policy_names.get(hit.pdf, hit.pdf)}** · page {hit.page}\n\n> {hit.snippet}")
+
+    # Iterate through all policies
+    for policy_no, policy in policies.items():
         title = policy.get("title", "")
-        pdf_path = policy.get("pdf")  # ensure HOSPITAL_POLICIES has 'pdf' key
-
-        with st.expander(f"{policy_no} – {title}"):
-            if pdf_path and pdf_path.exists():
-                with open(pdf_path, "rb") as f:
-                    st.download_button(
-                        label="⬇️ Download PDF",
-                        data=f,
-                        file_name=pdf_path.name,
-                        mime="application/pdf"
-                    )
+        pdf_path = policy.get("pdf")  # ensure each policy has a 'pdf' key
+
+        # The PDF is only read once someone switches its policy on
+        if not st.toggle(f"{policy_no} – {title}", key=f"G_pdf_{policy_no}"):
+            continue
+        if pdf_path and pdf_path.exists():
+            st.download_button(
+                label="⬇️ Download PDF",
+                data=load_pdf(str(pdf_path), pdf_path.stat().st_mtime_ns),
+                file_name=pdf_path.name,
+                mime="application/pdf"
+            )
+        else:
+            st.error("❌ PDF not available. Contact pharmacy or administration.")
+
+with tabs[6]:
+    policies_tab(HOSPITAL_POLICIES)
+
+# =========================
+# Tab H – Ward syringe board
+# =========================
+WARD_BOARD_REFRESH_SECONDS = 60
+
+@st.cache_resource
+def get_ward_schedule():
+    # One board per server process, shared by every session on the ward
+    return WardSchedule()
+
+def clock_time(epoch):
+    # Syringes lasting beyond a day get the weekday too
+    return time.strftime("%H:%M" if epoch - time.time() < 86400 else "%a %H:%M", time.localtime(epoch))
+
+@timed_fragment("H – Ward board", run_every=WARD_BOARD_REFRESH_SECONDS)
+def ward_board_tab(catalog):
+    st.header("H – Ward syringe board")
+    ward = get_ward_schedule()
+
+    with st.expander("➕ Start or replace a syringe"):
+        bed = st.text_input("Bed:", key="H_bed").strip()
+        prepared = {entry.name: entry.preparations for entry in catalog.entries if entry.preparations}
+        choice = st.selectbox("Drug:", list(prepared) + ["Other"], key="H_drug")
+        preparation = None
+        if choice == "Other":
+            drug = st.text_input("Medication name:", key="H_other_name").strip()
+        else:
+            drug = choice
+            labels = [preparation_label(p) for p in prepared[choice]]
+            if len(labels) > 1:
+                label = st.selectbox("Standard preparation:", labels, key=f"H_preparation_{choice}")
+            else:
+                label = labels[0]
+                st.caption(f"Standard preparation: {label}")
+            preparation = prepared[choice][labels.index(label)]
+            choice = f"{choice} {label}"
+        # Widget keys follow the chosen drug and preparation (not the typed name, which
+        # would reset them on every keystroke), so choosing another loads its defaults
+        units = ["mg", "mcg", "g", "units", "mmol"]
+        col1, col2, col3 = st.columns(3)
+        amount = col1.number_input("Amount", min_value=0.001, value=preparation.amount if preparation else 1.0,
+                                   key=f"H_amount_{choice}")
+        unit = col2.selectbox("Unit", units, index=units.index(preparation.unit) if preparation else 0,
+                              key=f"H_unit_{choice}")
+        volume = col3.number_input("Volume (mL)", min_value=1.0, value=preparation.volume_ml if preparation else 50.0,
+                                   key=f"H_volume_{choice}")
+
+        rate = None
+        if st.radio("Rate", ["mL/hr", "Dose"], horizontal=True, key="H_rate_mode") == "mL/hr":
+            rate = st.number_input("Rate (mL/hr)", min_value=0.0, key="H_rate")
+        else:
+            col1, col2, col3 = st.columns(3)
+            dose = col1.number_input("Dose", min_value=0.0, key="H_dose")
+            dose_unit = col2.selectbox("Dose unit", ["mcg/kg/min", "mg/kg/hr", "mcg/kg/hr", "mcg/min", "mg/hr",
+                                                     "mcg/hr", "units/hr"], key="H_dose_unit")
+            weight = col3.number_input("Weight (kg)", min_value=0.0, key="H_weight")
+            # Nothing to check until the form is filled in
+            if dose <= 0 or ("/kg/" in dose_unit and weight <= 0):
+                st.caption("Enter the dose (and the weight for a per-kg dose) to work out the pump rate.")
+            else:
+                try:
+                    rate = rate_ml_per_hour(dose, dose_unit, amount, unit, volume, weight)
+                    st.info(f"Pump rate: {rate:.1f} mL/hr")
+                except ValueError as exc:
+                    st.error(f"⚠️ {exc}")
+        remaining = st.number_input("Volume left in the syringe (mL)", min_value=0.0, value=volume,
+                                    key=f"H_remaining_{choice}")
+
+        if st.button("Start syringe", key="H_start"):
+            if not bed or not drug:
+                st.warning("Please enter the bed and the medication name.")
+            elif remaining > volume:
+                st.warning("The volume left cannot exceed the syringe volume.")
+            elif rate is None:
+                st.warning("Please enter a dose the pump rate can be worked out from.")
             else:
-                st.error("❌ PDF not available. Contact pharmacy or administration.")
+                ward.start(bed, drug, amount, unit, volume, rate, remaining)
+                st.success(f"Bed {bed}: {drug} {rate:.1f} mL/hr")
+
+    beds = ward.beds()
+    if beds:
+        with st.expander("🔧 Titrate, replace or stop"):
+            bed = st.selectbox("Bed:", beds, key="H_update_bed")
+            infusion = ward.get(bed)
+            if infusion is not None:
+                st.caption(f"{infusion.drug}, {infusion.preparation} at {infusion.rate_ml_hr:g} mL/hr")
+                new_rate = st.number_input("New rate (mL/hr)", min_value=0.0, value=infusion.rate_ml_hr,
+                                           key=f"H_new_rate_{bed}")
+                col1, col2, col3 = st.columns(3)
+                if col1.button("Set rate", key="H_set_rate") and ward.set_rate(bed, new_rate) is None:
+                    st.warning(f"Bed {bed} has been stopped in another session.")
+                if col2.button("Syringe replaced", key="H_replace") and ward.replace_syringe(bed) is None:
+                    st.warning(f"Bed {bed} has been stopped in another session.")
+                if col3.button("Stop", key="H_stop"):
+                    ward.stop(bed)
+
+    st.subheader("⏰ Next syringe changes")
+    rows = ward.next_changes(limit=20)
+    if rows:
+        st.dataframe(
+            [{**row._asdict(), "runs_out_at": clock_time(row.runs_out_at)} for row in rows],
+            hide_index=True,
+        )
+    else:
+        st.caption("No running infusions.")
+
+    hours = st.number_input("Prepare for the next (hours)", min_value=1, max_value=24, value=4, key="H_prep_hours")
+    plan = ward.prep_plan(hours)
+    if plan:
+        st.dataframe(
+            [{"drug": drug, "preparation": label, "syringes": count} for (drug, label), count in sorted(plan.items())],
+            hide_index=True,
+        )
+
+with tabs[7]:
+    ward_board_tab(drug_catalog)
 
 
 
@@ -430,96 +694,116 @@ with tabs[6]:
 st.markdown("---")
 st.markdown("## 🤖 Nurse Assistant")
 
-# Initialize chat memory
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {
-            "role": "assistant",
-            "content": (
-                "👋 Hello Nurse!\n\n"
-                "I’m your ICU Nurse Assistant.\n"
-                "You can ask me about:\n"
-                "• Medication policies\n"
-                "• Preparation & administration\n"
-                "• ICU safety reminders\n\n"
-                "💡 Example: *How do I administer dopamine safely?*"
-            )
-        }
-    ]
-
-# Clear chat button
-col1, col2 = st.columns([6, 1])
-with col2:
-    if st.button("🧹 Clear", key="clear_chat"):
-        st.session_state.messages = [
-            {
-                "role": "assistant",
-                "content": "👋 Chat cleared. How can I help you?"
-            }
-        ]
-
-# Display chat messages (ChatGPT style)
-for msg in st.session_state.messages:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
-
-# Chat input
-user_prompt = st.chat_input("Type your question or select from the list (A to G)… 👩‍⚕️")
-
-if user_prompt:
-    # Show user message
-    st.session_state.messages.append(
-        {"role": "user", "content": user_prompt}
-    )
-    with st.chat_message("user"):
-        st.markdown(user_prompt)
-
-    # Assistant typing indicator
-    with st.chat_message("assistant"):
-        with st.spinner("Nurse Assistant is thinking…"):
-            tip = drug_tips.get(user_prompt.lower(), drug_tips["other"])
-
-            prompt = f"""
-You are an ICU Nurse Assistant.
-
-User question:
-{user_prompt}
-
-Clinical tip (if relevant):
-{tip}
-
-Respond like a real clinical assistant:
-- Clear
-- Professional
-- Nursing-focused
-- Safety-oriented
-
-Do NOT calculate doses.
-Always remind to follow hospital policy and local guidelines.
-"""
-
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a professional ICU nurse assistant."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3
-                )
-                assistant_reply = response.choices[0].message.content
-            except Exception:
-                assistant_reply = (
-                    "⚠️ I’m unable to respond right now.\n\n"
-                    "Please follow your hospital medication policy."
-                )
-
-            st.markdown(assistant_reply)
-
-    # Save assistant reply
-    st.session_state.messages.append(
-        {"role": "assistant", "content": assistant_reply}
-    )
+CHAT_PAGE_SIZE = 20
+
+@timed_fragment("Nurse Assistant")
+def nurse_assistant(catalog):
+    # Initialize chat memory (bounded; older turns are folded into a summary)
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ChatMemory(
+            "👋 Hello Nurse!\n\n"
+            "I’m your ICU Nurse Assistant.\n"
+            "You can ask me about:\n"
+            "• Medication policies\n"
+            "• Preparation & administration\n"
+            "• ICU safety reminders\n\n"
+            "💡 Example: *How do I administer dopamine safely?*"
+        )
+        st.session_state.chat_visible = CHAT_PAGE_SIZE
+    memory = st.session_state.chat_memory
+
+    # Clear chat button
+    col1, col2 = st.columns([6, 1])
+    with col1:
+        ask_fresh = st.checkbox(
+            "🔄 Ask fresh", key="chat_ask_fresh", help="Always get a new answer instead of a saved one to a similar question"
+        )
+    with col2:
+        if st.button("🧹 Clear", key="clear_chat"):
+            memory = st.session_state.chat_memory = ChatMemory("👋 Chat cleared. How can I help you?")
+            st.session_state.chat_visible = CHAT_PAGE_SIZE
+
+    # Display only the most recent messages (ChatGPT style)
+    hidden = len(memory) - st.session_state.chat_visible
+    if hidden > 0 and st.button(f"⬆️ Load older messages ({hidden} hidden)", key="chat_load_older"):
+        st.session_state.chat_visible += CHAT_PAGE_SIZE
+    for msg in memory.recent(st.session_state.chat_visible):
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
+
+    # Chat input
+    user_prompt = st.chat_input("Type your question or select from the list (A to G)… 👩‍⚕️")
+
+    if user_prompt:
+        # Conversation context is taken before the new question is added
+        summary, history = memory.context()
+
+        # Show user message
+        memory.add("user", user_prompt)
+        with st.chat_message("user"):
+            st.markdown(user_prompt)
+
+        # Stream the reply as it is generated
+        with st.chat_message("assistant"):
+            # Saved answers are kept per drug, so a dopamine answer never serves dobutamine.
+            # Follow-ups ("how do I monitor it?") depend on the conversation, so only a
+            # first question that names a drug is looked up or saved.
+            entry = catalog.lookup(user_prompt)
+            scope = entry.name if entry else ""
+            cacheable = bool(scope) and not summary and not history
+            chat_cache = get_chat_cache()
+            saved = chat_cache.lookup(user_prompt, scope) if cacheable and not ask_fresh else None
+            if saved is not None:
+                METRICS.inc("llm_cache_hits_total", call="chat")
+                assistant_reply = saved.answer
+                st.markdown(assistant_reply)
+                st.caption(f"♻️ Saved answer to a similar question: “{saved.question}”. Tick “Ask fresh” for a new one.")
+            else:
+                METRICS.inc("llm_cache_misses_total", call="chat")
+                tip = catalog.tip_for(user_prompt)
+                retriever = get_policy_retriever()
+                retriever.refresh()
+                passages = retriever.retrieve(user_prompt, k=3)
+                excerpts = [(policy_citation(p.pdf, p.page), p.text) for p in passages]
+                assistant_reply = st.write_stream(chat_reply_stream(user_prompt, tip, excerpts, summary, history))
+                if passages:
+                    sources = " · ".join(dict.fromkeys(policy_citation(p.pdf, p.page) for p in passages))
+                    st.caption(f"📚 Sources: {sources}")
+                    assistant_reply += f"\n\n*📚 Sources: {sources}*"
+                if cacheable and FALLBACK_REPLY not in assistant_reply:
+                    chat_cache.put(user_prompt, assistant_reply, scope)
+
+        # Save assistant reply
+        audit_ai_response("chat", assistant_reply)
+        memory.add("assistant", assistant_reply)
+
+nurse_assistant(drug_catalog)
+
+# AI latency (time to first token / total) for this server process.
+# Both timing panels only render (and so import pandas) once switched on.
+if st.sidebar.toggle("⏱️ AI response timing", key="sidebar_ai_timing"):
+    timing_rows = STREAM_STATS.summary()
+    if timing_rows:
+        st.sidebar.dataframe(timing_rows, hide_index=True)
+    else:
+        st.sidebar.caption("No AI responses yet.")
+
+# Rerun cost: whole script vs. single tab / panel fragments
+if st.sidebar.toggle("⏱️ Rerun timing", key="sidebar_rerun_timing"):
+    rerun_rows = RERUN_STATS.summary()
+    if rerun_rows:
+        st.sidebar.dataframe(rerun_rows, hide_index=True)
+    else:
+        st.sidebar.caption("No reruns recorded yet.")
+
+# Hidden admin panel: open the app with ?admin=<ADMIN_TOKEN>
+admin_token = os.getenv("ADMIN_TOKEN")
+if admin_token and st.query_params.get("admin") == admin_token:
+    with st.sidebar.expander("🛠️ Runtime metrics", expanded=True):
+        st.dataframe(METRICS.summary(), hide_index=True)
+        st.dataframe(METRICS.counters(), hide_index=True)
+        st.dataframe(METRICS.gauges(), hide_index=True)
+        st.download_button("Prometheus metrics", METRICS.prometheus_text(), file_name="metrics.txt")
 
 # Disclaimer
 # =========================
@@ -530,6 +814,6 @@ st.markdown(
     "Always follow hospital protocols and verify with pharmacology manuals."
 )
 
-
-
-
+script_seconds = time.perf_counter() - script_started
+RERUN_STATS.record(FULL_SCRIPT, script_seconds)
+record_first_paint(script_seconds)
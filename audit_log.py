@@ -0,0 +1,314 @@
+"""Append-only audit log of calculations and AI responses.
+
+Every calculator run in the UI (inputs with their units, result, tab,
+session and latency) and every AI answer shown (as a SHA-256 of its text)
+is appended to a SQLite table in WAL mode. Recording only appends a tuple
+to an in-memory deque; a background thread per process turns the pending
+events into rows (argument names, JSON, hashes) and inserts them in
+batches, one transaction each. Worker processes sharing the file each have
+their own writer, and SQLite's locking (with a busy timeout) serializes
+them. Triggers reject UPDATE and DELETE, so rows can only be added.
+
+    python audit_log.py --since 2026-10-17T07:00 --until 2026-10-17T08:00 --kind calculation
+    python audit_log.py --since 2026-10-17 --summary
+"""
+import argparse
+import atexit
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from metrics import METRICS
+
+DEFAULT_PATH = Path(os.getenv("AUDIT_LOG_PATH", ".cache/audit_log.sqlite3"))
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_PENDING = 100_000
+
+CALCULATION = "calculation"
+AI_RESPONSE = "ai_response"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    session TEXT NOT NULL,
+    tab TEXT NOT NULL,
+    name TEXT NOT NULL,
+    inputs TEXT,
+    result TEXT,
+    error TEXT,
+    latency_ms REAL,
+    digest TEXT,
+    pid INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audit_events_ts ON audit_events (ts);
+CREATE TRIGGER IF NOT EXISTS audit_events_no_update BEFORE UPDATE ON audit_events
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS audit_events_no_delete BEFORE DELETE ON audit_events
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+"""
+COLUMNS = ("id", "ts", "kind", "session", "tab", "name", "inputs", "result", "error", "latency_ms", "digest", "pid")
+
+
+def connect(path, readonly=False):
+    if readonly:
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True, timeout=10,
+                               check_same_thread=False)
+    else:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+    conn.execute("PRAGMA busy_timeout=10000")
+    return conn
+
+
+def _jsonable(value):
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def _dumps(value):
+    return json.dumps(value, default=_jsonable, separators=(",", ":"))
+
+
+_signatures = {}
+
+
+def _arguments(func, args, kwargs):
+    """Named arguments of a call, defaults included, so units are always recorded."""
+    signature = _signatures.get(func)
+    if signature is None:
+        signature = _signatures[func] = inspect.signature(func)
+    try:
+        bound = signature.bind(*args, **kwargs)
+    except TypeError:
+        return {"args": list(args), **kwargs}
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+class AuditLog:
+    def __init__(self, path=DEFAULT_PATH, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING, metrics=METRICS):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self._pending = deque()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._conn = None
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    # =========================
+    # Recording (UI path)
+    # =========================
+    def call(self, tab, session, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` and record it as a calculation; returns its result."""
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            self._append((time.time(), CALCULATION, session, tab, func, args, kwargs, None, repr(exc),
+                          time.perf_counter() - started))
+            raise
+        self._append((time.time(), CALCULATION, session, tab, func, args, kwargs, result, None,
+                      time.perf_counter() - started))
+        return result
+
+    def ai_response(self, call, text, tab="", session=""):
+        """Record that an AI answer was shown; only its hash and length are stored."""
+        self._append((time.time(), AI_RESPONSE, session, tab, call, None, None, text, None, None))
+
+    def _append(self, event):
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._pending) >= self.max_pending:
+            # Never block the UI on a stalled disk; the loss is counted
+            self.metrics.inc("audit_dropped_total")
+            return
+        self._pending.append(event)
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    # =========================
+    # Writing (background)
+    # =========================
+    def _start(self):
+        with self._write_lock:
+            if self._pid == os.getpid():
+                return
+            # First use, or a forked worker: the parent's connection and thread are not ours
+            self._pid = os.getpid()
+            self._pending = deque()
+            self._conn = connect(self.path)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every pending event now; returns the number written."""
+        written = 0
+        with self._write_lock:
+            while self._pending and self._conn is not None:
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    batch.append(self._pending.popleft())
+                rows = [self._row(event) for event in batch]
+                try:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    self._conn.executemany(
+                        f"INSERT INTO audit_events ({', '.join(COLUMNS[1:])}) VALUES ({', '.join('?' * (len(COLUMNS) - 1))})",
+                        rows,
+                    )
+                    self._conn.execute("COMMIT")
+                except sqlite3.Error:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    # Keep the batch for the next attempt
+                    self._pending.extendleft(reversed(batch))
+                    self.metrics.inc("audit_write_errors_total")
+                    break
+                written += len(rows)
+        if written:
+            self.metrics.inc("audit_events_total", written)
+        return written
+
+    def _row(self, event):
+        ts, kind, session, tab, func, args, kwargs, result, error, latency = event
+        if kind == AI_RESPONSE:
+            text = result or ""
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            return (ts, kind, session, tab, func, None, _dumps({"chars": len(text)}), None, None, digest, self._pid)
+        return (
+            ts, kind, session, tab, func.__name__, _dumps(_arguments(func, args, kwargs)), _dumps(result), error,
+            latency * 1000, None, self._pid,
+        )
+
+    def close(self):
+        if self._thread is not None and self._pid == os.getpid():
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout=5)
+            self.flush()
+            self._conn.close()
+            self._conn = None
+            self._pid = None
+
+
+# =========================
+# Reading
+# =========================
+def _timestamp(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+class AuditReader:
+    """Read-only access; time ranges are answered from the ``ts`` index."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self._conn = connect(path, readonly=True)
+
+    def _where(self, start, end, **filters):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_timestamp(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(_timestamp(end))
+        for column, value in filters.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def events(self, start=None, end=None, kind=None, tab=None, session=None, limit=None):
+        """Events with ``start <= ts < end`` (epoch seconds, datetimes or ISO strings), oldest first."""
+        where, params = self._where(start, end, kind=kind, tab=tab, session=session)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM audit_events{where} ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for row in self._conn.execute(sql, params):
+            event = dict(zip(COLUMNS, row))
+            for column in ("inputs", "result"):
+                if event[column] is not None:
+                    event[column] = json.loads(event[column])
+            yield event
+
+    def summary(self, start=None, end=None):
+        """Count and mean latency per kind, tab and calculator, for capacity planning."""
+        where, params = self._where(start, end)
+        rows = self._conn.execute(
+            f"""
+            SELECT kind, tab, name, COUNT(*), AVG(latency_ms), COUNT(error), COUNT(DISTINCT session)
+            FROM audit_events{where} GROUP BY kind, tab, name ORDER BY kind, tab, name
+            """,
+            params,
+        )
+        return [
+            {"kind": kind, "tab": tab, "name": name, "count": count,
+             "mean_latency_ms": None if mean is None else round(mean, 3), "errors": errors, "sessions": sessions}
+            for kind, tab, name, count, mean, errors, sessions in rows
+        ]
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the audit log by time range.")
+    parser.add_argument("--path", type=Path, default=DEFAULT_PATH)
+    parser.add_argument("--since", help="ISO date/time (inclusive)")
+    parser.add_argument("--until", help="ISO date/time (exclusive)")
+    parser.add_argument("--kind", choices=(CALCULATION, AI_RESPONSE))
+    parser.add_argument("--tab")
+    parser.add_argument("--session")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--summary", action="store_true", help="counts and mean latency instead of events")
+    args = parser.parse_args(argv)
+    if not args.path.exists():
+        parser.error(f"no audit log at {args.path}")
+
+    reader = AuditReader(args.path)
+    if args.summary:
+        rows = reader.summary(args.since, args.until)
+    else:
+        rows = reader.events(args.since, args.until, args.kind, args.tab, args.session, args.limit)
+    for row in rows:
+        sys.stdout.write(json.dumps(row) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
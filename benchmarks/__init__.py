@@ -0,0 +1,4 @@
+"""Benchmarks for the calculators, Streamlit reruns and AI helpers.
+
+Run ``python -m benchmarks.run``; see ``benchmarks/run.py`` for options.
+"""
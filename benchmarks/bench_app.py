@@ -0,0 +1,50 @@
+"""Full-script rerun timing of the Streamlit app through ``AppTest``.
+
+``wall`` numbers include AppTest's own overhead; ``script`` and fragment
+numbers are what ``rerun_timing`` records inside the script itself.
+"""
+from rerun_timing import FULL_SCRIPT, RERUN_STATS
+
+from benchmarks.fake_openai import stub_openai
+from benchmarks.harness import app_test, median_of, timed_run
+
+
+def _p50_seconds(scope):
+    for row in RERUN_STATS.summary():
+        if row["scope"] == scope:
+            return row["p50_ms"] / 1000
+    return 0.0
+
+
+def run(quick=False):
+    repeat = 3 if quick else 10
+    results = {}
+    with stub_openai():
+        results["app.first_run.wall"] = median_of([timed_run(app_test()) for _ in range(3)])
+
+        at = app_test()
+        timed_run(at)
+        at.checkbox[0].check()
+        timed_run(at)
+
+        RERUN_STATS.clear()
+        samples = []
+        for i in range(repeat):
+            at.number_input(key="Edrop").set_value(10.0 + i)
+            samples.append(timed_run(at))
+        results["app.rerun.wall"] = median_of(samples)
+        results["app.rerun.script"] = _p50_seconds(FULL_SCRIPT)
+        results["app.rerun.fragment.iv_gravity"] = _p50_seconds("E – IV rate drip")
+
+        at.button(key="btn_Dopamine").click()
+        timed_run(at)
+        samples = []
+        for i in range(repeat):
+            at.number_input(key="A_i_dose").set_value(5.0)
+            at.number_input(key="A_i_weight").set_value(70.0)
+            at.number_input(key="A_i_stock").set_value(200.0 + i)
+            at.number_input(key="A_i_volume").set_value(50.0)
+            at.button(key="A_i_calc").click()
+            samples.append(timed_run(at))
+        results["app.calculate_infusion.wall"] = median_of(samples)
+    return results
@@ -0,0 +1,43 @@
+"""Audit log cost on the UI path, in the background writer and for readers."""
+import tempfile
+import time
+from pathlib import Path
+
+from audit_log import AuditLog, AuditReader
+from engine import calculate_tablet
+
+from benchmarks.harness import measure
+
+EVENTS = 10_000
+
+
+def run(quick=False):
+    repeat = 3 if quick else 7
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "audit.sqlite3"
+        # A long interval and a large batch keep the writer thread out of the UI-path timings
+        log = AuditLog(path, batch_size=10 * EVENTS, flush_interval=3600)
+
+        results["audit.calculation.record"] = measure(
+            lambda: log.call("D", "bench", calculate_tablet, 0.5, 250.0, "g", "mg"), number=EVENTS, repeat=repeat,
+            setup=log.flush,
+        )
+        results["audit.ai_response.record"] = measure(
+            lambda: log.ai_response("chat", "Monitor blood pressure closely.", "", "bench"), number=EVENTS,
+            repeat=repeat, setup=log.flush,
+        )
+
+        def fill():
+            for _ in range(EVENTS):
+                log.call("D", "bench", calculate_tablet, 0.5, 250.0, "g", "mg")
+        results["audit.flush.per_event"] = measure(log.flush, repeat=repeat, setup=fill) / EVENTS
+        log.close()
+
+        reader = AuditReader(path)
+        now = time.time()
+        results["audit.read.last_minute"] = measure(
+            lambda: sum(1 for _ in reader.events(now - 60, now + 60, kind="calculation", limit=1000)), repeat=repeat
+        )
+        reader.close()
+    return results
@@ -0,0 +1,58 @@
+"""Scalar and batch calculator microbenchmarks."""
+import numpy as np
+
+from engine import (
+    calculate_infusion,
+    calculate_infusion_batch,
+    calculate_iv_gravity,
+    calculate_iv_gravity_batch,
+    calculate_iv_pump,
+    calculate_iv_pump_batch,
+    calculate_oral,
+    calculate_oral_batch,
+    calculate_parenteral,
+    calculate_parenteral_batch,
+    calculate_tablet,
+    calculate_tablet_batch,
+)
+
+from benchmarks.harness import measure
+
+BATCH_ROWS = 100_000
+
+SCALAR_CASES = {
+    "infusion": lambda: calculate_infusion("Dopamine", 5.0, 70.0, 200.0, 50.0, 60.0),
+    "parenteral": lambda: calculate_parenteral(50.0, 100.0, 10.0, 70.0),
+    "oral": lambda: calculate_oral(250.0, 125.0, 5.0),
+    "tablet": lambda: calculate_tablet(0.5, 250.0, "g", "mg"),
+    "iv_gravity": lambda: calculate_iv_gravity(1000.0, 20.0, 8.0, "hours"),
+    "iv_pump": lambda: calculate_iv_pump(500.0, 4.0),
+}
+
+
+def batch_cases(rows):
+    rng = np.random.default_rng(0)
+    uniform = lambda low, high: rng.uniform(low, high, rows)
+    drugs = rng.choice(np.array(["Dopamine", "Dobutamine", "Fentanyl", "Propofol"]), rows)
+    dose, weight, stock, volume, minutes = uniform(1, 20), uniform(30, 150), uniform(50, 400), uniform(20, 100), uniform(30, 120)
+    tablet_dose, dose_units = uniform(0.1, 2), rng.choice(np.array(["mg", "g"]), rows)
+    drop_factor, time_value, time_units = uniform(10, 60), uniform(1, 12), rng.choice(np.array(["minutes", "hours"]), rows)
+    return {
+        "infusion": lambda: calculate_infusion_batch(drugs, dose, weight, stock, volume, minutes),
+        "parenteral": lambda: calculate_parenteral_batch(dose, stock, volume),
+        "oral": lambda: calculate_oral_batch(dose, stock, volume, weight),
+        "tablet": lambda: calculate_tablet_batch(tablet_dose, stock, dose_units, "mg"),
+        "iv_gravity": lambda: calculate_iv_gravity_batch(volume, drop_factor, time_value, time_units),
+        "iv_pump": lambda: calculate_iv_pump_batch(volume, time_value),
+    }
+
+
+def run(quick=False):
+    results = {}
+    for name, call in SCALAR_CASES.items():
+        results[f"calculators.{name}.scalar"] = measure(call, number=2_000 if quick else 20_000, repeat=5)
+    rows = BATCH_ROWS // 10 if quick else BATCH_ROWS
+    for name, call in batch_cases(rows).items():
+        # Reported per row so quick and full runs are comparable
+        results[f"calculators.{name}.batch_per_row"] = measure(call, number=3, repeat=5) / rows
+    return results
@@ -0,0 +1,44 @@
+"""Nurse Assistant rendering cost as the conversation grows.
+
+Each case pre-fills the session's ``ChatMemory`` and times a rerun, once
+with the default page of recent messages and once with every kept message
+shown, so paging regressions show up as growth with ``messages``.
+"""
+import logging
+
+from chat_memory import ChatMemory
+
+from benchmarks.fake_openai import REPLY, stub_openai
+from benchmarks.harness import app_test, median_of, timed_run
+
+SIZES = (10, 50, 200)
+
+
+def _memory(count):
+    memory = ChatMemory("Hello")
+    for i in range(count // 2):
+        memory.add("user", f"Question {i}: how do I give dopamine through a peripheral line?")
+        memory.add("assistant", REPLY * 4)
+    return memory
+
+
+def _rerun_time(count, visible, repeat):
+    at = app_test()
+    # Seeding session_state outside a script run logs a harmless warning
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    at.session_state["chat_memory"] = _memory(count)
+    at.session_state["chat_visible"] = visible
+    timed_run(at)
+    at.checkbox[0].check()
+    timed_run(at)
+    return median_of([timed_run(at) for _ in range(repeat)])
+
+
+def run(quick=False):
+    repeat = 3 if quick else 7
+    results = {}
+    with stub_openai():
+        for count in SIZES:
+            results[f"chat.rerun.paged.{count}"] = _rerun_time(count, 20, repeat)
+            results[f"chat.rerun.all_visible.{count}"] = _rerun_time(count, count, repeat)
+    return results
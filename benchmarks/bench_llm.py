@@ -0,0 +1,98 @@
+"""AI helper latency against a local fake OpenAI server.
+
+The server waits ``BENCH_LLM_DELAY`` seconds (default 0.05) before answering
+and ``BENCH_LLM_TOKEN_DELAY`` (default 0.002) between streamed tokens, so
+the numbers are the helpers' own overhead on top of a known model latency.
+"""
+import itertools
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import ai
+from llm_cache import LLMCache
+from llm_client import ResilientClient, build_openai_client
+from llm_scheduler import LLMScheduler
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.harness import measure, median_of
+
+DELAY = float(os.getenv("BENCH_LLM_DELAY", "0.05"))
+TOKEN_DELAY = float(os.getenv("BENCH_LLM_TOKEN_DELAY", "0.002"))
+
+
+def _stream_timing(stream):
+    started = time.perf_counter()
+    first = None
+    for piece in stream:
+        if first is None and piece:
+            first = time.perf_counter() - started
+    return first or 0.0, time.perf_counter() - started
+
+
+def _concurrent(func, callers):
+    """Wall time for ``callers`` threads calling ``func`` at the same moment."""
+    barrier = threading.Barrier(callers + 1)
+
+    def worker():
+        barrier.wait()
+        func()
+
+    threads = [threading.Thread(target=worker) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def run(quick=False):
+    repeat = 3 if quick else 10
+    counter = itertools.count()
+    results = {}
+    with FakeOpenAIServer(delay=DELAY, token_delay=TOKEN_DELAY) as server, tempfile.TemporaryDirectory() as tmp:
+        # Same admission control as the app, with the rate limit off so it never throttles the timings
+        scheduler = LLMScheduler(rate=None)
+        client = ResilientClient(build_openai_client("sk-bench", base_url=server.base_url), scheduler=scheduler)
+        cache = LLMCache(Path(tmp) / "bench_cache.sqlite3")
+        ai.configure(lambda: client, lambda: cache)
+
+        # Warm the connection pool so the first sample is not a TCP handshake
+        ai.ask_ai("Warmup", "1 mL/hr", "", "Infusion")
+
+        # A new drug name per call misses the cache every time
+        results["llm.ask_ai.miss"] = measure(
+            lambda: ai.ask_ai(f"Drug {next(counter)}", "10 mL/hr", "Monitor BP.", "Infusion"), repeat=repeat
+        )
+        results["llm.ask_ai.hit"] = measure(
+            lambda: ai.ask_ai("Warmup", "1 mL/hr", "", "Infusion"), number=100, repeat=repeat
+        )
+
+        ttft, total = [], []
+        for _ in range(repeat):
+            first, whole = _stream_timing(
+                ai.ask_ai_stream(f"Drug {next(counter)}", "10 mL/hr", "Monitor BP.", "Infusion")
+            )
+            ttft.append(first)
+            total.append(whole)
+        results["llm.ask_ai_stream.ttft"] = median_of(ttft)
+        results["llm.ask_ai_stream.total"] = median_of(total)
+
+        results["llm.generate_med_policy.miss"] = measure(
+            lambda: ai.generate_med_policy(f"Drug {next(counter)}"), repeat=repeat
+        )
+
+        # Shift handover: eight sessions ask for the same new policy at once
+        results["llm.generate_med_policy.concurrent_8"] = median_of([
+            _concurrent(lambda name=f"Drug {next(counter)}": ai.generate_med_policy(name), 8) for _ in range(repeat)
+        ])
+
+        excerpts = [("MM 5.4 p.3", "Dopamine 400 mg in 250 mL D5W. " * 20)] * 3
+        chat = [_stream_timing(ai.chat_reply_stream("How do I give dopamine?", "", excerpts)) for _ in range(repeat)]
+        results["llm.chat_reply_stream.ttft"] = median_of([first for first, _ in chat])
+        results["llm.chat_reply_stream.total"] = median_of([whole for _, whole in chat])
+    return results
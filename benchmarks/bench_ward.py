@@ -0,0 +1,34 @@
+"""Ward syringe board: titrations and board reads on a busy ward."""
+import random
+
+from ward_schedule import WardSchedule
+
+from benchmarks.harness import measure
+
+BEDS = 40
+UPDATES = 10_000
+
+
+def ward(now=0.0):
+    schedule = WardSchedule(clock=lambda: now)
+    rng = random.Random(0)
+    for bed in range(BEDS):
+        schedule.start(bed, "Fentanyl", 1000, "mcg", 50, rng.uniform(1, 20), rng.uniform(5, 50), now=now)
+    return schedule
+
+
+def run(quick=False):
+    repeat = 3 if quick else 7
+    results = {}
+    schedule = ward()
+    rng = random.Random(1)
+    rates = [(rng.randrange(BEDS), rng.uniform(1, 20)) for _ in range(UPDATES)]
+
+    def titrate():
+        for bed, rate in rates:
+            schedule.set_rate(bed, rate, now=0.0)
+    results["ward.set_rate.per_update"] = measure(titrate, repeat=repeat) / UPDATES
+    results["ward.next_changes.10"] = measure(lambda: schedule.next_changes(10, now=0.0), number=1000, repeat=repeat)
+    results["ward.due_within.1h"] = measure(lambda: schedule.due_within(3600, now=0.0), number=1000, repeat=repeat)
+    results["ward.prep_plan.4h"] = measure(lambda: schedule.prep_plan(4, now=0.0), number=1000, repeat=repeat)
+    return results
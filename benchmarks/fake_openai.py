@@ -0,0 +1,146 @@
+"""Local stand-ins for the OpenAI API.
+
+``FakeOpenAIServer`` is a real HTTP server speaking the chat completions
+protocol (JSON and server-sent-event streaming) with a configurable delay
+before the first token and between tokens, so the AI helpers can be timed
+through the full client stack without network access or an API key.
+``StubOpenAI`` is an in-process replacement for ``openai.OpenAI`` used when
+only the Streamlit script is being timed.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+REPLY = (
+    "Monitor blood pressure and heart rate closely. Confirm the line is patent "
+    "and the concentration matches the label. Follow your hospital policy."
+)
+
+_USAGE = {"prompt_tokens": 100, "completion_tokens": len(REPLY.split()), "total_tokens": 100 + len(REPLY.split())}
+
+
+def _chunk(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        server.requests += 1
+        model = body.get("model", "gpt-4o-mini")
+        time.sleep(server.delay)
+        if body.get("stream"):
+            self._stream(model, (body.get("stream_options") or {}).get("include_usage"))
+        else:
+            self._complete(model)
+
+    def _complete(self, model):
+        payload = json.dumps({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+            "usage": _USAGE,
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, model, include_usage=False):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [_chunk(model, {"role": "assistant", "content": ""})]
+        events += [_chunk(model, {"content": word + " "}) for word in REPLY.split()]
+        events.append(_chunk(model, {}, "stop"))
+        if include_usage:
+            events.append({**_chunk(model, {}), "choices": [], "usage": _USAGE})
+        for i, event in enumerate(events):
+            if i > 1:
+                time.sleep(self.server.token_delay)
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay=0.05, token_delay=0.002, port=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.delay = delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # Clients dropping pooled keep-alive connections are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _StubCompletions:
+    def create(self, model, messages, temperature=0.0, stream=False, **kwargs):
+        if not stream:
+            message = types.SimpleNamespace(content=REPLY)
+            usage = types.SimpleNamespace(prompt_tokens=100, completion_tokens=len(REPLY.split()))
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+        return (
+            types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=word + " "))], usage=None)
+            for word in REPLY.split()
+        )
+
+
+class StubOpenAI:
+    def __init__(self, *args, **kwargs):
+        self.chat = types.SimpleNamespace(completions=_StubCompletions())
+
+    def with_options(self, **kwargs):
+        return self
+
+
+@contextmanager
+def stub_openai():
+    """Route every ``openai.OpenAI`` built inside the block to ``StubOpenAI``."""
+    with mock.patch("openai.OpenAI", StubOpenAI), mock.patch.dict(os.environ, {"OPENAI_API_KEY": "sk-bench"}):
+        yield
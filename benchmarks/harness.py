@@ -0,0 +1,38 @@
+"""Small timing helpers shared by the ``bench_*`` modules."""
+import statistics
+import time
+from pathlib import Path
+
+
+def measure(func, number=1, repeat=5, setup=None):
+    """Median seconds per call of ``func`` over ``repeat`` rounds of ``number`` calls."""
+    rounds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - started) / number)
+    return statistics.median(rounds)
+
+
+def median_of(samples):
+    return statistics.median(samples) if samples else 0.0
+
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+
+
+def app_test():
+    """A fresh ``AppTest`` of the Streamlit script (run it under ``stub_openai``)."""
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(str(APP_PATH), default_timeout=60)
+
+
+def timed_run(at):
+    started = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return time.perf_counter() - started
@@ -0,0 +1,95 @@
+"""Run the benchmarks and compare them with the saved baselines.
+
+    python -m benchmarks.run                     # all suites, compare with baselines.json
+    python -m benchmarks.run calculators llm     # selected suites only
+    python -m benchmarks.run --quick             # fewer rounds, for a fast sanity check
+    python -m benchmarks.run --update            # record the current numbers as the baseline
+
+A benchmark regresses when it is more than ``--threshold`` (default 25%)
+slower than its baseline; the run then exits with status 1. Baselines are
+machine-specific: record them on the machine that runs the comparison.
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines.json"
+SUITES = ("calculators", "app", "chat", "llm", "audit", "ward")
+
+
+def compare(results, baseline, threshold):
+    """Rows of (name, baseline, current, ratio, status) and whether anything regressed."""
+    rows, regressed = [], False
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            rows.append((name, None, current, None, "new"))
+            continue
+        ratio = current / previous
+        status = "ok"
+        if ratio > 1 + threshold:
+            status, regressed = "REGRESSED", True
+        elif ratio < 1 - threshold:
+            status = "faster"
+        rows.append((name, previous, current, ratio, status))
+    return rows, regressed
+
+
+def _format(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f} µs"
+    return f"{seconds * 1e3:.2f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmarks and check them against the baselines.")
+    parser.add_argument("suites", nargs="*", metavar="suite", help=f"suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--update", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--quick", action="store_true", help="fewer rounds; noisier")
+    parser.add_argument("--output", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    # The app resolves policies/ relative to the working directory; keep its
+    # caches out of the real ones
+    os.chdir(ROOT)
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    scratch = tempfile.TemporaryDirectory()
+    os.environ["LLM_CACHE_PATH"] = str(Path(scratch.name) / "llm_cache.sqlite3")
+
+    results = {}
+    for suite in args.suites or SUITES:
+        print(f"Running {suite}…", file=sys.stderr)
+        results.update(importlib.import_module(f"benchmarks.bench_{suite}").run(quick=args.quick))
+    scratch.cleanup()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    rows, regressed = compare(results, baseline, args.threshold)
+    width = max(len(name) for name, *_ in rows)
+    for name, previous, current, ratio, status in rows:
+        change = f"{ratio - 1:+.0%}" if ratio is not None else ""
+        print(f"{name:<{width}}  {_format(previous):>12}  {_format(current):>12}  {change:>6}  {status}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    if args.update:
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline updated: {args.baseline}", file=sys.stderr)
+        return 0
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
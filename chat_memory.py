@@ -0,0 +1,88 @@
+"""Token-budgeted conversation memory for the Nurse Assistant.
+
+``ChatMemory`` keeps a bounded list of chat messages per session. Messages
+pushed out of the list are folded into a rolling extractive summary, so no
+extra model call is needed. ``context`` returns what goes to the model: the
+summary of everything older, plus as many recent turns as fit the token
+budget.
+"""
+import re
+from collections import deque
+
+DEFAULT_TOKEN_BUDGET = 1500
+DEFAULT_SUMMARY_BUDGET = 300
+DEFAULT_MAX_MESSAGES = 200
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def summarize_message(message, limit=160):
+    """First sentence of a message, clipped, tagged with who said it."""
+    text = " ".join(message["content"].split())
+    first = SENTENCE_END.split(text, 1)[0]
+    if len(first) > limit:
+        first = first[:limit].rsplit(" ", 1)[0] + "…"
+    who = "Nurse asked" if message["role"] == "user" else "Assistant said"
+    return f"- {who}: {first}"
+
+
+class ChatMemory:
+    def __init__(self, greeting, token_budget=DEFAULT_TOKEN_BUDGET,
+                 summary_budget=DEFAULT_SUMMARY_BUDGET, max_messages=DEFAULT_MAX_MESSAGES):
+        self.greeting = {"role": "assistant", "content": greeting}
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_messages = max_messages
+        self.messages = []
+        self._summary = deque()
+        self._summary_tokens = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def add(self, role, content):
+        self.messages.append({"role": role, "content": content})
+        while len(self.messages) > self.max_messages:
+            self._fold(self.messages.pop(0))
+
+    def recent(self, count):
+        """The greeting (while nothing has been trimmed) plus the last ``count`` messages."""
+        shown = self.messages[-count:] if count else []
+        if len(shown) == len(self.messages) and not self._summary:
+            return [self.greeting] + shown
+        return shown
+
+    def context(self, token_budget=None):
+        """(summary text, recent messages) to send with the next question."""
+        budget = token_budget or self.token_budget
+        window = []
+        for message in reversed(self.messages):
+            cost = estimate_tokens(message["content"])
+            if cost > budget:
+                break
+            window.append(message)
+            budget -= cost
+        window.reverse()
+
+        older = self.messages[:len(self.messages) - len(window)]
+        lines = list(self._summary) + [summarize_message(m) for m in older]
+        # Keep the newest summary lines that fit
+        kept, used = [], 0
+        for line in reversed(lines):
+            used += estimate_tokens(line)
+            if used > self.summary_budget:
+                break
+            kept.append(line)
+        return "\n".join(reversed(kept)), window
+
+    def _fold(self, message):
+        line = summarize_message(message)
+        self._summary.append(line)
+        self._summary_tokens += estimate_tokens(line)
+        while self._summary_tokens > self.summary_budget and self._summary:
+            self._summary_tokens -= estimate_tokens(self._summary.popleft())
@@ -0,0 +1,276 @@
+"""Drug catalog loaded from ``drug_catalog.json`` with typo-tolerant lookup.
+
+The catalog is read once per process and reloaded when the file's mtime or
+size changes (checked at most every ``check_interval`` seconds). Names and
+aliases are normalized, with strengths and units stripped, so
+"Dopamine 400mg" finds Dopamine. Three indexes serve lookups:
+
+- exact keys: a dict of normalized names and aliases
+- prefixes: a sorted key list searched with ``bisect`` for autocomplete
+- trigrams: postings used for Dice-similarity fuzzy matching of typos
+
+All three stay well under a millisecond with thousands of entries.
+"""
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_PATH = Path(os.getenv("DRUG_CATALOG_PATH", Path(__file__).with_name("drug_catalog.json")))
+DEFAULT_MIN_SCORE = 0.5
+
+DrugEntry = namedtuple("DrugEntry", ["name", "type", "tip", "aliases", "time_mandatory", "icu_infusion", "preparations"])
+# Standard syringe/bag: ``amount`` of drug (in ``unit``) made up to ``volume_ml``
+Preparation = namedtuple("Preparation", ["amount", "unit", "volume_ml"])
+
+_WORD = re.compile(r"[a-z0-9.%/]+")
+_STRENGTH = re.compile(r"^\d+(?:\.\d+)?(?:mg|mcg|g|ml|l|iu|units?|meq|mmol|%|/\w+)*$")
+_UNITS = {"mg", "mcg", "g", "ml", "l", "iu", "unit", "units", "meq", "mmol", "%"}
+
+
+def normalize(text):
+    """Lowercase words of ``text`` without strengths and units ("Dopamine 400mg" -> "dopamine")."""
+    words = (w.strip("./") for w in _WORD.findall(str(text).lower()))
+    return " ".join(w for w in words if w and not _STRENGTH.match(w) and w not in _UNITS)
+
+
+def preparation_label(preparation):
+    return f"{preparation.amount:g} {preparation.unit} in {preparation.volume_ml:g} mL"
+
+
+def _preparations(item):
+    """A drug's standard preparations, usual one first; the file may give one or a list."""
+    specs = item.get("preparation") or ()
+    if isinstance(specs, dict):
+        specs = (specs,)
+    return tuple(Preparation(float(spec["amount"]), spec["unit"], float(spec["volume_ml"])) for spec in specs)
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Index:
+    """Immutable lookup structures for one version of the catalog file."""
+
+    def __init__(self, document):
+        self.default_tip = document.get("default_tip", "")
+        self.caution = document.get("caution", "")
+        self.entries = [
+            DrugEntry(
+                name=item["name"],
+                type=item.get("type", ""),
+                tip=item.get("tip", ""),
+                aliases=tuple(item.get("aliases", ())),
+                time_mandatory=bool(item.get("time_mandatory")),
+                icu_infusion=bool(item.get("icu_infusion")),
+                preparations=_preparations(item),
+            )
+            for item in document.get("drugs", [])
+        ]
+        self.by_name = {entry.name: entry for entry in self.entries}
+        # The calculators ask about the same few names on every call
+        self.time_mandatory_cache = {}
+        self.sorted_names = np.array(sorted(self.by_name), dtype=str)
+        self.sorted_time_mandatory = np.array([self.by_name[n].time_mandatory for n in self.sorted_names.tolist()], dtype=bool)
+        self.by_key = {}
+        for entry in self.entries:
+            for text in (entry.name, *entry.aliases):
+                self.by_key.setdefault(normalize(text), entry)
+        self.by_key.pop("", None)
+        self.keys = sorted(self.by_key)
+        self.longest_key = max((len(k.split()) for k in self.keys), default=0)
+        self.postings = {}
+        self.key_trigrams = []
+        for i, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.key_trigrams.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+
+class DrugCatalog:
+    def __init__(self, path=DEFAULT_PATH, check_interval=2.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0.0
+        self._index = _Index({})
+        self.reload_if_changed(force=True)
+
+    # =========================
+    # Loading
+    # =========================
+    def reload_if_changed(self, force=False):
+        """Re-read the file if its mtime or size changed; returns True on reload."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            try:
+                stat = self.path.stat()
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if signature == self._signature:
+                    return False
+                document = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # A file caught mid-save keeps the previous catalog in service
+                if force:
+                    raise
+                return False
+            # Build first, then swap, so readers never see a half-built index
+            self._index = _Index(document)
+            self._signature = signature
+            return True
+
+    def _current(self):
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.reload_if_changed()
+        return self._index
+
+    # =========================
+    # Views
+    # =========================
+    @property
+    def entries(self):
+        return list(self._current().entries)
+
+    @property
+    def default_tip(self):
+        return self._current().default_tip
+
+    @property
+    def caution(self):
+        return self._current().caution
+
+    @property
+    def time_mandatory(self):
+        return [e.name for e in self._current().entries if e.time_mandatory]
+
+    @property
+    def icu_drugs(self):
+        """Drugs for the ICU infusion grid, time-mandatory ones first."""
+        entries = [e for e in self._current().entries if e.icu_infusion]
+        return [e.name for e in entries if e.time_mandatory] + [e.name for e in entries if not e.time_mandatory]
+
+    def get(self, name):
+        """Entry by its exact catalog name."""
+        return self._current().by_name.get(name)
+
+    def is_time_mandatory(self, name):
+        """Exact (non-fuzzy) match on a name or alias flagged ``time_mandatory``."""
+        cache = self._current().time_mandatory_cache
+        mandatory = cache.get(name)
+        if mandatory is None:
+            entry = self.lookup(name, fuzzy=False)
+            mandatory = bool(entry and entry.time_mandatory)
+            if len(cache) >= 4096:
+                cache.clear()
+            cache[name] = mandatory
+        return mandatory
+
+    def time_mandatory_mask(self, names):
+        """``is_time_mandatory`` over an array of names.
+
+        Exact catalog names are resolved with one ``searchsorted``; only the
+        distinct remaining strings go through ``lookup``.
+        """
+        index = self._current()
+        shape = np.shape(names)
+        names = np.asarray(names, dtype=str).ravel()
+        if not index.sorted_names.size:
+            return np.zeros(shape, dtype=bool)
+        position = np.searchsorted(index.sorted_names, names).clip(0, index.sorted_names.size - 1)
+        exact = index.sorted_names[position] == names
+        mask = index.sorted_time_mandatory[position] & exact
+        if not exact.all():
+            rest, inverse = np.unique(names[~exact], return_inverse=True)
+            flags = np.array([self.is_time_mandatory(name) for name in rest.tolist()], dtype=bool)
+            mask[~exact] = flags[inverse.ravel()]
+        return mask.reshape(shape)
+
+    # =========================
+    # Lookup
+    # =========================
+    def lookup(self, text, fuzzy=True, min_score=DEFAULT_MIN_SCORE):
+        """Best entry for free text (a name, an alias or a sentence mentioning one), or None.
+
+        Exact matches win, then the longest run of words that is a known
+        name, then (if ``fuzzy``) the closest name by trigram similarity.
+        """
+        index = self._current()
+        key = normalize(text)
+        if not key:
+            return None
+        entry = index.by_key.get(key)
+        if entry is not None:
+            return entry
+        words = key.split()
+        for size in range(min(index.longest_key, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                entry = index.by_key.get(" ".join(words[start:start + size]))
+                if entry is not None:
+                    return entry
+        if not fuzzy:
+            return None
+        matches = self._similar(index, key, 1, min_score)
+        return index.by_key[matches[0][0]] if matches else None
+
+    def tip_for(self, text, default=None):
+        entry = self.lookup(text)
+        if entry is not None and entry.tip:
+            return entry.tip
+        return self.default_tip if default is None else default
+
+    def complete(self, prefix, limit=8, min_score=0.3):
+        """Catalog names for an autocomplete box: prefix matches, then close typos."""
+        index = self._current()
+        key = normalize(prefix)
+        if not key:
+            return []
+        names = []
+        position = bisect.bisect_left(index.keys, key)
+        while position < len(index.keys) and len(names) < limit and index.keys[position].startswith(key):
+            names.append(index.by_key[index.keys[position]].name)
+            position += 1
+        if len(names) < limit:
+            for candidate, _ in self._similar(index, key, limit, min_score):
+                names.append(index.by_key[candidate].name)
+        return list(dict.fromkeys(names))[:limit]
+
+    @staticmethod
+    def _similar(index, key, limit, min_score):
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(index.postings.get(gram, ()))
+        scored = [
+            (index.keys[i], 2 * count / (len(grams) + index.key_trigrams[i]))
+            for i, count in shared.items()
+        ]
+        scored = [(k, score) for k, score in scored if score >= min_score]
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_catalog():
+    """The process-wide catalog at ``DEFAULT_PATH``."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = DrugCatalog()
+    return _default
@@ -0,0 +1,295 @@
+"""Drug calculation engine.
+
+Plain functions with no Streamlit dependency, so the formulas can be
+imported by the UI, scripts and batch jobs alike. Every scalar calculator
+has a ``*_batch`` counterpart that takes NumPy arrays (or scalars, which
+broadcast) and returns a ``BatchResult``: an array of values, an array of
+units and an array of per-row error codes instead of ``None``.
+
+Which drugs need weight and time for an infusion is read from the drug
+catalog (``time_mandatory`` in ``drug_catalog.json``). All unit handling
+goes through ``units``: each calculator takes its units as arguments, and
+incompatible ones give ``None`` (scalar) or ``ERR_INCOMPATIBLE_UNITS``
+(batch).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from drug_catalog import default_catalog
+from units import UnitError, ratio, ratio_arrays
+
+# Dose unit of time-mandatory infusions unless the caller says otherwise
+DEFAULT_RATE_UNIT = "mcg/kg/min"
+
+# =========================
+# Error codes (batch API)
+# =========================
+OK = 0
+ERR_MISSING_INPUT = 1
+ERR_INVALID_TIME = 2
+ERR_INVALID_STOCK = 3
+ERR_INVALID_DOSE = 4
+ERR_MISSING_WEIGHT = 5
+ERR_INCOMPATIBLE_UNITS = 6
+
+ERROR_MESSAGES = {
+    OK: "",
+    ERR_MISSING_INPUT: "Missing dose, stock or volume",
+    ERR_INVALID_TIME: "Time is missing or not positive",
+    ERR_INVALID_STOCK: "Stock must be greater than zero",
+    ERR_INVALID_DOSE: "Dose must be greater than zero",
+    ERR_MISSING_WEIGHT: "Weight is required for this drug",
+    ERR_INCOMPATIBLE_UNITS: "Units are unknown or cannot be converted",
+}
+
+BatchResult = namedtuple("BatchResult", ["values", "units", "errors"])
+
+
+def is_time_mandatory(drug):
+    """Drugs flagged ``time_mandatory`` in the catalog need weight and time."""
+    return default_catalog().is_time_mandatory(drug)
+
+
+# =========================
+# Scalar calculators
+# =========================
+_SAME_UNIT = (1.0, 1.0)
+
+def _factor(from_unit, to_unit):
+    """``units.ratio``, or None when the units do not convert."""
+    try:
+        return ratio(from_unit, to_unit)
+    except UnitError:
+        return None
+
+def calculate_infusion(drug, dose, weight, stock, volume, time_min=None, dose_unit=None, stock_unit="mg"):
+    """Time-mandatory drugs take a per-kg rate (``DEFAULT_RATE_UNIT``); others a dose in ``stock_unit``."""
+    if None in (dose, stock, volume):
+        return None, None
+    if is_time_mandatory(drug):
+        if None in (weight, time_min) or time_min <= 0:
+            return None, None
+        factor = _factor(dose_unit or DEFAULT_RATE_UNIT, f"{stock_unit}/kg/min")
+        if factor is None:
+            return None, None
+        total_ml = (dose * weight * volume * time_min * factor[0]) / (stock * factor[1])
+        return round(total_ml, 2), "mL (total)"
+    factor = _SAME_UNIT if not dose_unit or dose_unit == stock_unit else _factor(dose_unit, stock_unit)
+    if factor is None:
+        return None, None
+    if not time_min:
+        return round((dose * volume * factor[0]) / (stock * factor[1]), 2), "mL/hr"
+    return round((dose * volume * time_min * factor[0]) / (stock * factor[1]), 2), "mL (total)"
+
+def calculate_parenteral(dose, stock, volume, weight=None, dose_unit="mg", stock_unit="mg"):
+    if dose_unit != stock_unit:
+        factor = _factor(dose_unit, stock_unit)
+        if factor is None:
+            return None
+        dose, stock = dose * factor[0], stock * factor[1]
+    return (dose * weight / stock) * volume if weight else (dose / stock) * volume
+
+def calculate_oral(dose, stock, volume, weight=None, dose_unit="mg", stock_unit="mg"):
+    return calculate_parenteral(dose, stock, volume, weight, dose_unit, stock_unit)
+
+def calculate_tablet(dose, stock, dose_unit="mg", stock_unit="mg"):
+    if dose <= 0 or stock <= 0:
+        return None
+    if dose_unit != stock_unit:
+        factor = _factor(dose_unit, stock_unit)
+        if factor is None:
+            return None
+        dose, stock = dose * factor[0], stock * factor[1]
+    return dose / stock
+
+def calculate_iv_gravity(volume, drop_factor, time_value, time_unit="minutes", volume_unit="mL"):
+    if time_value <= 0:
+        return None
+    if time_unit != "minutes":
+        factor = _factor(time_unit, "minutes")
+        if factor is None:
+            return None
+        time_value = time_value * factor[0] / factor[1]
+    if volume_unit != "mL":
+        factor = _factor(volume_unit, "mL")
+        if factor is None:
+            return None
+        volume = volume * factor[0] / factor[1]
+    return (volume * drop_factor) / time_value
+
+def calculate_iv_pump(volume, time_hours, time_unit="hours", volume_unit="mL"):
+    if time_hours <= 0:
+        return None
+    if time_unit != "hours":
+        factor = _factor(time_unit, "hours")
+        if factor is None:
+            return None
+        time_hours = time_hours * factor[0] / factor[1]
+    if volume_unit != "mL":
+        factor = _factor(volume_unit, "mL")
+        if factor is None:
+            return None
+        volume = volume * factor[0] / factor[1]
+    return volume / time_hours
+
+
+# =========================
+# Batch helpers
+# =========================
+def _as_float(values):
+    """Float array where ``None`` becomes NaN (NaN marks a missing input)."""
+    return np.asarray(values, dtype=float)
+
+def _flag(errors, mask, code):
+    """Set ``code`` on rows that match ``mask`` and have no earlier error."""
+    errors[(errors == OK) & mask] = code
+
+def _finish(values, units, errors):
+    values = np.where(errors == OK, values, np.nan)
+    units = np.where(errors == OK, units, "")
+    return BatchResult(values, units, errors)
+
+def _divide(num, den):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return num / den
+
+def _round2(values):
+    """``round(x, 2)`` per element, matching the scalar calculators exactly.
+
+    ``np.round`` scales by 100 first, which can flip values that sit on a
+    half-cent boundary (1.575 → 1.58 where ``round`` gives 1.57). Only those
+    borderline rows are handed to Python's correctly rounded ``round``.
+    """
+    rounded = np.round(values, 2)
+    frac = np.abs(np.modf(values * 100)[0])
+    borderline = np.flatnonzero(np.abs(frac - 0.5) < 1e-6)
+    if borderline.size:
+        rounded = np.array(rounded, dtype=float, ndmin=1)
+        flat = np.ravel(values)
+        rounded.flat[borderline] = [round(float(flat[i]), 2) for i in borderline]
+        rounded = rounded.reshape(np.shape(values))
+    return rounded
+
+def _unit_ratio(errors, from_units, to_units):
+    """(num, den) for a unit conversion, or None when single units already match.
+
+    Rows whose units do not convert are flagged.
+    """
+    if isinstance(from_units, str) and isinstance(to_units, str):
+        # One unit for every row: no per-row lookup, and no arithmetic when they match
+        if from_units == to_units:
+            return None
+        factor = _factor(from_units, to_units)
+        if factor is None:
+            _flag(errors, True, ERR_INCOMPATIBLE_UNITS)
+            return np.nan, np.nan
+        return factor
+    num, den = ratio_arrays(from_units, to_units)
+    _flag(errors, np.broadcast_to(np.isnan(num), errors.shape), ERR_INCOMPATIBLE_UNITS)
+    return num, den
+
+
+# =========================
+# Batch calculators
+# =========================
+def calculate_infusion_batch(drug, dose, weight, stock, volume, time_min=None, dose_unit=None, stock_unit="mg"):
+    """Vectorized ``calculate_infusion``; ``drug`` and the units may be one value or arrays.
+
+    An empty ``dose_unit`` entry means the default for that row's drug.
+    """
+    dose, weight, stock, volume, time_min = np.broadcast_arrays(
+        *(_as_float(v) for v in (dose, weight, stock, volume, time_min))
+    )
+    mandatory = np.broadcast_to(default_catalog().time_mandatory_mask(drug), dose.shape)
+    errors = np.zeros(dose.shape, dtype=np.int8)
+
+    _flag(errors, np.isnan(dose) | np.isnan(stock) | np.isnan(volume), ERR_MISSING_INPUT)
+    _flag(errors, mandatory & np.isnan(weight), ERR_MISSING_WEIGHT)
+    _flag(errors, mandatory & ~(time_min > 0), ERR_INVALID_TIME)
+    _flag(errors, ~(stock > 0), ERR_INVALID_STOCK)
+
+    if dose_unit is None and isinstance(stock_unit, str):
+        # Default dose units and one stock unit: a single scalar factor
+        rate_num, rate_den = _factor(DEFAULT_RATE_UNIT, f"{stock_unit}/kg/min") or (np.nan, np.nan)
+        amount_num, amount_den = _SAME_UNIT
+        _flag(errors, mandatory & np.isnan(rate_num), ERR_INCOMPATIBLE_UNITS)
+    else:
+        stock_unit = np.asarray(stock_unit, dtype=str)
+        if dose_unit is None:
+            rate_unit, amount_unit = DEFAULT_RATE_UNIT, stock_unit
+        else:
+            dose_unit = np.asarray(dose_unit, dtype=str)
+            rate_unit = np.where(dose_unit == "", DEFAULT_RATE_UNIT, dose_unit)
+            amount_unit = np.where(dose_unit == "", stock_unit, dose_unit)
+        rate_num, rate_den = ratio_arrays(rate_unit, np.char.add(stock_unit, "/kg/min"))
+        amount_num, amount_den = ratio_arrays(amount_unit, stock_unit)
+        _flag(errors, np.isnan(np.where(mandatory, rate_num, amount_num)), ERR_INCOMPATIBLE_UNITS)
+
+    # A missing or zero time on a non-mandatory drug means "rate per hour"
+    has_time = np.nan_to_num(time_min) != 0
+    total = _divide(dose * weight * volume * time_min * rate_num, stock * rate_den)
+    rate = _divide(dose * volume * amount_num, stock * amount_den)
+    timed = _divide(dose * volume * time_min * amount_num, stock * amount_den)
+
+    values = np.where(mandatory, total, np.where(has_time, timed, rate))
+    units = np.where(mandatory | has_time, "mL (total)", "mL/hr")
+    return _finish(_round2(values), units, errors)
+
+def calculate_parenteral_batch(dose, stock, volume, weight=None, dose_unit="mg", stock_unit="mg"):
+    dose, stock, volume, weight = np.broadcast_arrays(
+        *(_as_float(v) for v in (dose, stock, volume, weight))
+    )
+    errors = np.zeros(dose.shape, dtype=np.int8)
+    _flag(errors, np.isnan(dose) | np.isnan(stock) | np.isnan(volume), ERR_MISSING_INPUT)
+    _flag(errors, ~(stock > 0), ERR_INVALID_STOCK)
+    factor = _unit_ratio(errors, dose_unit, stock_unit)
+    if factor is not None:
+        dose, stock = dose * factor[0], stock * factor[1]
+
+    # A missing or zero weight falls back to the flat dose, as in the scalar version
+    per_kg = np.nan_to_num(weight) != 0
+    dose = np.where(per_kg, dose * weight, dose)
+    return _finish(_divide(dose, stock) * volume, "mL", errors)
+
+def calculate_oral_batch(dose, stock, volume, weight=None, dose_unit="mg", stock_unit="mg"):
+    return calculate_parenteral_batch(dose, stock, volume, weight, dose_unit, stock_unit)
+
+def calculate_tablet_batch(dose, stock, dose_unit="mg", stock_unit="mg"):
+    dose, stock = np.broadcast_arrays(_as_float(dose), _as_float(stock))
+    errors = np.zeros(dose.shape, dtype=np.int8)
+    _flag(errors, np.isnan(dose) | np.isnan(stock), ERR_MISSING_INPUT)
+    _flag(errors, ~(dose > 0), ERR_INVALID_DOSE)
+    _flag(errors, ~(stock > 0), ERR_INVALID_STOCK)
+    factor = _unit_ratio(errors, dose_unit, stock_unit)
+    if factor is not None:
+        dose, stock = dose * factor[0], stock * factor[1]
+    return _finish(_divide(dose, stock), "tablet(s)", errors)
+
+def calculate_iv_gravity_batch(volume, drop_factor, time_value, time_unit="minutes", volume_unit="mL"):
+    volume, drop_factor, time_value = np.broadcast_arrays(
+        *(_as_float(v) for v in (volume, drop_factor, time_value))
+    )
+    errors = np.zeros(volume.shape, dtype=np.int8)
+    _flag(errors, np.isnan(volume) | np.isnan(drop_factor), ERR_MISSING_INPUT)
+    _flag(errors, ~(time_value > 0), ERR_INVALID_TIME)
+    minutes = _unit_ratio(errors, time_unit, "minutes")
+    if minutes is not None:
+        time_value = time_value * minutes[0] / minutes[1]
+    millilitres = _unit_ratio(errors, volume_unit, "mL")
+    if millilitres is not None:
+        volume = volume * millilitres[0] / millilitres[1]
+    return _finish(_divide(volume * drop_factor, time_value), "gtts/min", errors)
+
+def calculate_iv_pump_batch(volume, time_hours, time_unit="hours", volume_unit="mL"):
+    volume, time_hours = np.broadcast_arrays(_as_float(volume), _as_float(time_hours))
+    errors = np.zeros(volume.shape, dtype=np.int8)
+    _flag(errors, np.isnan(volume), ERR_MISSING_INPUT)
+    _flag(errors, ~(time_hours > 0), ERR_INVALID_TIME)
+    hours = _unit_ratio(errors, time_unit, "hours")
+    if hours is not None:
+        time_hours = time_hours * hours[0] / hours[1]
+    millilitres = _unit_ratio(errors, volume_unit, "mL")
+    if millilitres is not None:
+        volume = volume * millilitres[0] / millilitres[1]
+    return _finish(_divide(volume, time_hours), "mL/hr", errors)
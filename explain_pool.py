@@ -0,0 +1,78 @@
+"""Background worker pool for AI explanations.
+
+Calculations are rendered straight away; the explanation stream is handed to
+a bounded thread pool shared by every session. Each ``ExplanationJob``
+collects the streamed text as it arrives so the UI can poll it, and can be
+cancelled when the inputs it was computed for change.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_PENDING = 64
+
+
+class ExplanationJob:
+    def __init__(self, inputs, headline):
+        self.inputs = inputs
+        self.headline = headline
+        self.error = None
+        self._parts = []
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+        self._future = None
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self._future is not None and self._future.cancel():
+            self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _run(self, stream):
+        try:
+            for text in stream:
+                if self.cancelled:
+                    stream.close()
+                    break
+                self._parts.append(text)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self._done.set()
+
+
+class ExplanationPool:
+    """Bounded pool; submissions past ``max_pending`` fail fast instead of queueing."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="explain")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, inputs, headline, stream):
+        """Start consuming ``stream`` (a generator of text) in the background."""
+        job = ExplanationJob(inputs, headline)
+        if not self._slots.acquire(blocking=False):
+            job.error = RuntimeError("Explanation queue is full")
+            job._done.set()
+            stream.close()
+            return job
+        job._future = self._executor.submit(job._run, stream)
+        job._future.add_done_callback(lambda _: self._slots.release())
+        return job
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,116 @@
+"""Persistent cache for deterministic LLM completions.
+
+Answers are stored in SQLite keyed on a SHA-256 of model + prompt, so every
+Streamlit session (and every worker process on the same disk) shares them and
+they survive restarts. The cache is bounded by entry count with LRU eviction,
+entries expire after a TTL, and hit/miss counters are kept in the database.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_PATH = Path(os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3"))
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def cache_key(model, prompt):
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+            """
+        )
+
+    def get(self, model, prompt):
+        """Cached response text, or ``None`` on a miss or expired entry."""
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+                self._bump("hits")
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._bump("misses")
+            return None
+
+    def set(self, model, prompt, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                (cache_key(model, prompt), model, response, now, now),
+            )
+            self._evict()
+
+    def get_or_compute(self, model, prompt, compute):
+        """Return the cached answer or call ``compute()`` and store its result."""
+        cached = self.get(model, prompt)
+        if cached is not None:
+            return cached
+        response = compute()
+        self.set(model, prompt, response)
+        return response
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+            counters["entries"] = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        return counters
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.execute("UPDATE counters SET value = 0")
+
+    def _bump(self, name, amount=1):
+        self._conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+
+    def _evict(self):
+        expired = self._conn.execute(
+            "DELETE FROM completions WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        overflow = self._conn.execute(
+            """
+            DELETE FROM completions WHERE key IN (
+                SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        ).rowcount
+        if expired + overflow:
+            self._bump("evictions", expired + overflow)
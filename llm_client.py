@@ -0,0 +1,199 @@
+"""Process-wide OpenAI client with deadlines, retries and a circuit breaker.
+
+The app builds one ``ResilientClient`` per process (via ``st.cache_resource``)
+so the HTTP connection pool and TLS sessions survive reruns. Every call gets
+an overall deadline; 429, 5xx, timeouts and connection errors are retried
+with jittered exponential backoff; after repeated failures the breaker opens
+and calls fail fast with ``LLMUnavailable`` so the UI can show its fallback
+text instead of hanging. ``openai`` and ``httpx`` are imported on first use,
+so the app starts without paying for them. With a ``scheduler`` (see ``llm_scheduler``) each
+call first waits for a slot in its priority class; a streamed response
+keeps its slot until it has been read or closed.
+"""
+import random
+import threading
+import time
+
+DEFAULT_DEADLINE = 30.0
+DEFAULT_ATTEMPT_TIMEOUT = 20.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 8.0
+
+
+class LLMUnavailable(Exception):
+    """The completion could not be produced (breaker open, deadline hit or retries exhausted)."""
+
+
+def is_retryable(exc):
+    import openai
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def backoff_delay(attempt, base=DEFAULT_BACKOFF_BASE, cap=DEFAULT_BACKOFF_CAP):
+    """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures; probes again after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            # Half-open: let a single probe through
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def cancel_probe(self):
+        """Hand back a half-open probe that never reached the API (e.g. shed while queued)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+def build_openai_client(api_key, max_connections=50, max_keepalive=20, keepalive_expiry=60.0, base_url=None):
+    """OpenAI client over a tuned, long-lived httpx connection pool.
+
+    The SDK's own retries are disabled; ``ResilientClient`` owns the policy.
+    """
+    # Deferred: importing openai is the largest single cost of a cold start
+    import httpx
+    import openai
+    http_client = openai.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(DEFAULT_ATTEMPT_TIMEOUT, connect=DEFAULT_CONNECT_TIMEOUT),
+    )
+    return openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+class _SlotStream:
+    """A streamed response that gives its scheduler slot back once read or closed."""
+
+    def __init__(self, response, slot):
+        self._response = response
+        self._slot = slot
+
+    def __iter__(self):
+        try:
+            yield from self._response
+        finally:
+            self._slot.release()
+
+    def close(self):
+        try:
+            close = getattr(self._response, "close", None)
+            if close:
+                close()
+        finally:
+            self._slot.release()
+
+    def __del__(self):
+        self._slot.release()
+
+
+class ResilientClient:
+    def __init__(self, client, breaker=None, deadline=DEFAULT_DEADLINE,
+                 attempt_timeout=DEFAULT_ATTEMPT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS, scheduler=None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.scheduler = scheduler
+
+    def create(self, deadline=None, priority=None, **kwargs):
+        """``chat.completions.create`` under the scheduling, retry, deadline and breaker policy."""
+        if not self.breaker.allow():
+            raise LLMUnavailable("Circuit breaker is open")
+        expires = time.monotonic() + (deadline or self.deadline)
+        if self.scheduler is None:
+            return self._create(expires, **kwargs)
+        # Time in the queue counts against the deadline; shedding is not a service failure
+        args = () if priority is None else (priority,)
+        try:
+            slot = self.scheduler.acquire(*args, max_wait=max(0.0, expires - time.monotonic()))
+        except BaseException:
+            # Otherwise a shed probe would keep the breaker half-open for good
+            self.breaker.cancel_probe()
+            raise
+        try:
+            response = self._create(expires, **kwargs)
+        except BaseException:
+            slot.release()
+            raise
+        if kwargs.get("stream"):
+            return _SlotStream(response, slot)
+        slot.release()
+        return response
+
+    def _create(self, expires, **kwargs):
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise LLMUnavailable("Deadline exceeded")
+                response = self.client.chat.completions.create(
+                    timeout=min(self.attempt_timeout, remaining), **kwargs
+                )
+            except Exception as exc:
+                attempt += 1
+                delay = backoff_delay(attempt - 1)
+                retry = (
+                    is_retryable(exc)
+                    and attempt < self.max_attempts
+                    and time.monotonic() + delay < expires
+                )
+                if retry:
+                    time.sleep(delay)
+                    continue
+                if is_retryable(exc) or isinstance(exc, LLMUnavailable):
+                    self.breaker.record_failure()
+                else:
+                    # The API answered (e.g. a 400): the service itself is healthy
+                    self.breaker.record_success()
+                if isinstance(exc, LLMUnavailable):
+                    raise
+                raise LLMUnavailable(str(exc)) from exc
+            self.breaker.record_success()
+            return response
@@ -0,0 +1,157 @@
+"""Process-wide admission control for outbound LLM requests.
+
+Every request through ``ResilientClient`` takes a slot from one shared
+``LLMScheduler`` first. A slot needs both a free place under the
+concurrency cap and a token from a token bucket (``rate`` requests per
+second, bursts up to ``burst``). Waiting requests are served in priority
+order, FIFO within a class:
+
+1. ``INOTROPE``: Tab A inotrope explanations
+2. ``EXPLAIN``: the other calculator explanations
+3. ``CHAT``: Nurse Assistant replies
+4. ``POLICY``: generated medication policies
+
+A request still queued after its class's ``max_wait`` is shed with
+``LLMShed`` (an ``LLMUnavailable``), so the UI shows its usual fallback
+text instead of piling up behind a backlog. Lower classes give up sooner.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+from llm_client import LLMUnavailable
+from metrics import METRICS
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_RATE = 8.0
+DEFAULT_BURST = 16
+
+PriorityClass = namedtuple("PriorityClass", ["name", "rank", "max_wait"])
+
+INOTROPE = PriorityClass("inotrope", 0, 20.0)
+EXPLAIN = PriorityClass("explain", 1, 10.0)
+CHAT = PriorityClass("chat", 2, 8.0)
+POLICY = PriorityClass("policy", 3, 5.0)
+PRIORITIES = (INOTROPE, EXPLAIN, CHAT, POLICY)
+
+
+class LLMShed(LLMUnavailable):
+    """The request waited longer than its class allows and was dropped."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "event", "cancelled")
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.event = threading.Event()
+        self.cancelled = False
+
+
+class Slot:
+    """A granted request slot; ``release`` (or leaving the ``with`` block) frees it."""
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._scheduler._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 metrics=METRICS):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._depth = {p.name: 0 for p in PRIORITIES}
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+
+    def acquire(self, priority=EXPLAIN, max_wait=None):
+        """Block until a slot is granted; raise ``LLMShed`` after ``max_wait`` seconds."""
+        limit = priority.max_wait if max_wait is None else min(max_wait, priority.max_wait)
+        started = time.monotonic()
+        waiter = _Waiter(priority)
+        with self._lock:
+            heapq.heappush(self._queue, (priority.rank, next(self._sequence), waiter))
+            self._depth[priority.name] = self._depth.get(priority.name, 0) + 1
+            self._dispatch()
+            wait = self._token_wait()
+        while not waiter.event.is_set():
+            remaining = started + limit - time.monotonic()
+            if remaining <= 0:
+                with self._lock:
+                    if not waiter.event.is_set():
+                        waiter.cancelled = True
+                        self._depth[priority.name] -= 1
+                        self._publish()
+                        self.metrics.inc("llm_shed_total", priority=priority.name)
+                        raise LLMShed(f"LLM queue wait over {limit:g}s ({priority.name})")
+                break
+            # Woken by a release; otherwise re-check when the next token is due
+            waiter.event.wait(min(remaining, wait))
+            with self._lock:
+                self._dispatch()
+                wait = self._token_wait()
+        self.metrics.observe("llm_queue_wait_seconds", time.monotonic() - started, priority=priority.name)
+        return Slot(self)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self._in_flight, "queued": dict(self._depth), "tokens": self._tokens}
+
+    # =========================
+    # Internals
+    # =========================
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    # The rest are called with the lock held
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _token_wait(self):
+        if not self.rate or self._tokens >= 1:
+            # Only a release can help now, and a release dispatches
+            return float("inf")
+        return max(0.001, (1 - self._tokens) / self.rate)
+
+    def _dispatch(self):
+        self._refill()
+        while self._queue and self._in_flight < self.max_concurrency and (not self.rate or self._tokens >= 1):
+            _, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            if self.rate:
+                self._tokens -= 1
+            self._in_flight += 1
+            self._depth[waiter.priority.name] -= 1
+            waiter.event.set()
+        self._publish()
+
+    def _publish(self):
+        for name, depth in self._depth.items():
+            self.metrics.set("llm_queue_depth", depth, priority=name)
+        self.metrics.set("llm_in_flight", self._in_flight)
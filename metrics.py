@@ -0,0 +1,248 @@
+"""In-process runtime metrics: histograms and counters with exporters.
+
+Timings go into fixed-bucket histograms (one ``bisect`` and two additions
+per observation), so recording costs microseconds and memory does not grow
+with traffic. Percentiles are interpolated from the buckets. ``METRICS`` is
+shared by the whole process; it can be scraped in Prometheus text format
+(``serve_prometheus``) or appended to a JSONL file on a timer
+(``start_jsonl_export``).
+
+Metric names used by the app:
+
+- ``rerun_seconds{scope}``: full-script and fragment reruns
+- ``calculation_seconds{tab}`` / ``calculation_errors_total{tab}``
+- ``llm_call_seconds{call}`` / ``llm_errors_total{call}``
+- ``llm_tokens_total{call,kind}`` with kind ``prompt`` or ``completion``
+- ``llm_cache_hits_total{call}`` / ``llm_cache_misses_total{call}``
+- ``llm_coalesced_total{call}``: callers that shared an identical in-flight call
+- ``llm_queue_wait_seconds{priority}`` / ``llm_shed_total{priority}``
+- gauges ``llm_queue_depth{priority}`` and ``llm_in_flight``
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NAMESPACE = "drugcalc"
+
+# Upper bounds in seconds, from sub-millisecond calculations to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        """Set a gauge to its current value (e.g. a queue depth)."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe ``<name>_seconds``; an exception also counts ``<name>_errors_total``."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def summary(self):
+        """One row per histogram series with count and p50/p95/p99 in ms."""
+        with self._lock:
+            series = sorted(self._histograms.items())
+            return [
+                {
+                    "metric": name,
+                    "labels": ", ".join(f"{k}={v}" for k, v in key),
+                    "count": h.count,
+                    "p50_ms": round(1000 * h.quantile(0.50), 2),
+                    "p95_ms": round(1000 * h.quantile(0.95), 2),
+                    "p99_ms": round(1000 * h.quantile(0.99), 2),
+                }
+                for (name, key), h in series
+            ]
+
+    def counters(self):
+        with self._lock:
+            return [
+                {"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in key), "value": value}
+                for (name, key), value in sorted(self._counters.items())
+            ]
+
+    def gauges(self):
+        with self._lock:
+            return [
+                {"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in key), "value": value}
+                for (name, key), value in sorted(self._gauges.items())
+            ]
+
+    def snapshot(self):
+        """Plain-data copy of every series, for the JSONL export."""
+        with self._lock:
+            return {
+                "time": time.time(),
+                "histograms": [
+                    {"metric": name, "labels": dict(key), "count": h.count, "sum": h.sum,
+                     "buckets": dict(zip([*map(str, h.bounds), "+Inf"], h.counts))}
+                    for (name, key), h in sorted(self._histograms.items())
+                ],
+                "counters": [
+                    {"metric": name, "labels": dict(key), "value": value}
+                    for (name, key), value in sorted(self._counters.items())
+                ],
+                "gauges": [
+                    {"metric": name, "labels": dict(key), "value": value}
+                    for (name, key), value in sorted(self._gauges.items())
+                ],
+            }
+
+    def prometheus_text(self, namespace=NAMESPACE):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+        declared = set()
+        for (name, key), h in histograms:
+            full = f"{namespace}_{name}"
+            if full not in declared:
+                declared.add(full)
+                lines.append(f"# TYPE {full} histogram")
+            cumulative = 0
+            for bound, count in zip([*map(repr, h.bounds), "+Inf"], h.counts):
+                cumulative += count
+                lines.append(f"{full}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{full}_sum{_format_labels(key)} {h.sum!r}")
+            lines.append(f"{full}_count{_format_labels(key)} {h.count}")
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            for (name, key), value in series:
+                full = f"{namespace}_{name}"
+                if full not in declared:
+                    declared.add(full)
+                    lines.append(f"# TYPE {full} {kind}")
+                lines.append(f"{full}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def record_usage(call, usage, metrics=METRICS):
+    """Count prompt/completion tokens from a response's ``usage`` (if any)."""
+    if usage is None:
+        return
+    metrics.inc("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, call=call, kind="prompt")
+    metrics.inc("llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, call=call, kind="completion")
+
+
+# =========================
+# Exporters
+# =========================
+def serve_prometheus(port, host="0.0.0.0", metrics=METRICS):
+    """Serve ``GET /metrics`` from a daemon thread; returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_jsonl_export(path, interval=60.0, metrics=METRICS):
+    """Append a snapshot line to ``path`` every ``interval`` seconds; returns a stop event."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(metrics.snapshot()) + "\n")
+
+    threading.Thread(target=loop, name="metrics-jsonl", daemon=True).start()
+    return stop
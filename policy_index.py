@@ -0,0 +1,187 @@
+"""Full-text BM25 index over the hospital policy PDFs.
+
+Page text is extracted once with pypdf and persisted (with per-page term
+counts) to a JSON file. ``refresh`` re-extracts only PDFs whose size/mtime
+changed *and* whose SHA-256 differs, so a restart or a touched file costs a
+few ``stat`` calls. Searches return page-level hits with a snippet.
+
+Build or refresh from the command line with ``python policy_index.py``.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, namedtuple
+from pathlib import Path
+
+DEFAULT_POLICY_DIR = Path("policies")
+DEFAULT_INDEX_PATH = Path(os.getenv("POLICY_INDEX_PATH", ".cache/policy_index.json"))
+INDEX_VERSION = 1
+
+SearchHit = namedtuple("SearchHit", ["pdf", "page", "score", "snippet"])
+# Everything a query reads, replaced as a whole so a search never sees half a rebuild
+_Snapshot = namedtuple("_Snapshot", ["docs", "postings", "lengths", "avg_length", "signature"])
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to with".split()
+)
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pages(pdf_path):
+    """Plain text of every page, whitespace-normalized."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [" ".join((page.extract_text() or "").split()) for page in reader.pages]
+
+
+class PolicyIndex:
+    def __init__(self, policy_dir=DEFAULT_POLICY_DIR, index_path=DEFAULT_INDEX_PATH, k1=1.5, b=0.75):
+        self.policy_dir = Path(policy_dir)
+        self.index_path = Path(index_path)
+        self.k1 = k1
+        self.b = b
+        self._files = {}
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._load()
+        self.refresh()
+
+    # -------------------------
+    # Build / persist
+    # -------------------------
+    def _load(self):
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION:
+            self._files = data["files"]
+
+    def _save(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "files": self._files}), encoding="utf-8")
+        tmp.replace(self.index_path)
+
+    def refresh(self):
+        """Re-index new or changed PDFs and drop deleted ones. Returns names re-extracted."""
+        with self._lock:
+            changed = []
+            present = set()
+            dirty = False
+            for pdf in sorted(self.policy_dir.glob("*.pdf")):
+                present.add(pdf.name)
+                stat = pdf.stat()
+                entry = self._files.get(pdf.name)
+                if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    continue
+                digest = file_sha256(pdf)
+                if entry and entry["sha256"] == digest:
+                    entry.update(mtime=stat.st_mtime, size=stat.st_size)
+                    dirty = True
+                    continue
+                pages = extract_pages(pdf)
+                self._files[pdf.name] = {
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "sha256": digest,
+                    "pages": [{"text": text, "tf": Counter(tokenize(text))} for text in pages],
+                }
+                changed.append(pdf.name)
+                dirty = True
+            for name in set(self._files) - present:
+                del self._files[name]
+                dirty = True
+            if dirty or not self.index_path.exists():
+                self._save()
+            if dirty or self._snapshot is None:
+                self._build_postings()
+            return changed
+
+    def _build_postings(self):
+        docs = []
+        postings = {}
+        lengths = []
+        for name in sorted(self._files):
+            for number, page in enumerate(self._files[name]["pages"], start=1):
+                doc_id = len(docs)
+                docs.append((name, number, page["text"]))
+                lengths.append(sum(page["tf"].values()))
+                for term, count in page["tf"].items():
+                    postings.setdefault(term, []).append((doc_id, count))
+        signature = hashlib.sha256()
+        for name in sorted(self._files):
+            signature.update(f"{name}:{self._files[name]['sha256']};".encode("utf-8"))
+        avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self._snapshot = _Snapshot(docs, postings, lengths, avg_length, signature.hexdigest())
+
+    # -------------------------
+    # Query
+    # -------------------------
+    @property
+    def page_count(self):
+        return len(self._snapshot.docs)
+
+    @property
+    def signature(self):
+        """Digest of the indexed PDF contents; changes whenever a PDF does."""
+        return self._snapshot.signature
+
+    def pages(self):
+        """(pdf name, page number, text) for every indexed page."""
+        return list(self._snapshot.docs)
+
+    def search(self, query, limit=10):
+        snapshot = self._snapshot
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not snapshot.docs:
+            return []
+        total = len(snapshot.docs)
+        scores = {}
+        for term in terms:
+            docs = snapshot.postings.get(term, ())
+            if not docs:
+                continue
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs:
+                norm = self.k1 * (1 - self.b + self.b * snapshot.lengths[doc_id] / snapshot.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            SearchHit(snapshot.docs[d][0], snapshot.docs[d][1], round(score, 3), snippet(snapshot.docs[d][2], terms))
+            for d, score in ranked
+        ]
+
+
+def snippet(text, terms, width=160):
+    """Window of ``text`` around the first query term, with terms in bold."""
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\b", re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, (match.start() if match else 0) - width // 2)
+    window = text[start:start + width]
+    window = pattern.sub(lambda m: f"**{m.group(0)}**", window)
+    return ("…" if start else "") + window + ("…" if start + width < len(text) else "")
+
+
+if __name__ == "__main__":
+    import time
+
+    started = time.perf_counter()
+    index = PolicyIndex()
+    print(f"Indexed {index.page_count} pages in {time.perf_counter() - started:.2f}s -> {index.index_path}")
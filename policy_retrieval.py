@@ -0,0 +1,132 @@
+"""Offline passage retrieval over the policy PDFs for the Nurse Assistant.
+
+Policy pages (from ``PolicyIndex``) are split into overlapping word windows
+and embedded with signed feature hashing of unigrams and bigrams, weighted
+by IDF and L2-normalized. No external embedding service is involved. The
+chunk matrix is saved as ``.npy`` and opened with ``mmap_mode="r"``, so each
+process maps it once and a query is a single matrix-vector product.
+"""
+import json
+import os
+import threading
+import zlib
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from policy_index import PolicyIndex, tokenize
+
+DEFAULT_STORE_DIR = Path(os.getenv("POLICY_RETRIEVAL_DIR", ".cache/policy_retrieval"))
+DIMENSIONS = 1 << 13
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+
+Passage = namedtuple("Passage", ["pdf", "page", "score", "text"])
+# What a query reads, replaced as a whole so a query never mixes two builds
+_Snapshot = namedtuple("_Snapshot", ["chunks", "vectors", "idf", "signature"])
+
+
+def chunk_words(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    words = text.split()
+    step = size - overlap
+    for start in range(0, max(len(words) - overlap, 1), step):
+        yield " ".join(words[start:start + size])
+
+
+def _features(text):
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def hash_counts(text, dimensions=DIMENSIONS):
+    """Signed hashed term counts (crc32 is stable across processes)."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dimensions] += 1.0 if h & 0x80000000 else -1.0
+    return vector
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class PolicyRetriever:
+    def __init__(self, policy_index=None, store_dir=DEFAULT_STORE_DIR):
+        self.policy_index = policy_index or PolicyIndex()
+        self.store_dir = Path(store_dir)
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._load_or_build()
+
+    def _load_or_build(self):
+        meta_path = self.store_dir / "chunks.json"
+        signature = self.policy_index.signature
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            fresh = meta["signature"] == signature and meta["dimensions"] == DIMENSIONS
+        except (OSError, ValueError, KeyError):
+            fresh = False
+        if not fresh:
+            meta = self._build(signature)
+        vectors = np.load(self.store_dir / "vectors.npy", mmap_mode="r")
+        if vectors.shape[0] != len(meta["chunks"]):
+            # Another process replaced the files between our reads
+            meta = self._build(signature)
+            vectors = np.load(self.store_dir / "vectors.npy", mmap_mode="r")
+        idf = np.load(self.store_dir / "idf.npy")
+        self._snapshot = _Snapshot(meta["chunks"], vectors, idf, signature)
+
+    def _build(self, signature):
+        chunks = [
+            {"pdf": pdf, "page": page, "text": text}
+            for pdf, page, page_text in self.policy_index.pages()
+            for text in chunk_words(page_text)
+            if text
+        ]
+        counts = np.stack([hash_counts(c["text"]) for c in chunks]) if chunks else np.zeros((0, DIMENSIONS), np.float32)
+        doc_freq = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(chunks)) / (1 + doc_freq)).astype(np.float32) + 1.0
+        vectors = _normalize(counts * idf).astype(np.float32)
+
+        # Write-then-rename: other processes may have the old matrix mapped
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._replace("vectors.npy", lambda f: np.save(f, vectors))
+        self._replace("idf.npy", lambda f: np.save(f, idf))
+        meta = {"signature": signature, "dimensions": DIMENSIONS, "chunks": chunks}
+        self._replace("chunks.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+        return meta
+
+    def _replace(self, name, write):
+        tmp = self.store_dir / f".{name}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, self.store_dir / name)
+
+    def refresh(self):
+        """Rebuild only if the underlying PDFs changed."""
+        self.policy_index.refresh()
+        if self.policy_index.signature != self._snapshot.signature:
+            with self._lock:
+                if self.policy_index.signature != self._snapshot.signature:
+                    self._load_or_build()
+
+    def retrieve(self, query, k=3, min_score=0.05):
+        snapshot = self._snapshot
+        chunks = snapshot.chunks
+        if not chunks:
+            return []
+        q = hash_counts(query) * snapshot.idf
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return []
+        scores = snapshot.vectors @ (q / norm)
+        top = np.argpartition(-scores, min(k, scores.size) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            Passage(chunks[i]["pdf"], chunks[i]["page"], float(scores[i]), chunks[i]["text"])
+            for i in top
+            if scores[i] >= min_score
+        ]
@@ -0,0 +1,82 @@
+"""Precomputed bedside infusion-rate charts for the time-mandatory inotropes.
+
+The standard concentrations are the catalog preparations of each
+time-mandatory drug (MM 5.4). For each one the full dose × weight grid is
+computed in one vectorized call to ``calculate_infusion_batch`` (with a
+60-minute window, so the total volume is the hourly rate) and cached per
+preparation for the life of the process. pandas is only imported when a
+chart is displayed.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from drug_catalog import default_catalog, preparation_label
+from engine import calculate_infusion_batch
+
+DEFAULT_DOSES = (1.0, 20.0, 1.0)        # mcg/kg/min: start, stop, step
+DEFAULT_WEIGHTS = (30.0, 200.0, 1.0)    # kg
+
+# Drugs charted over a narrower dose range than DEFAULT_DOSES
+DOSE_AXES = {"Epinephrine": (0.05, 1.0, 0.05)}
+
+
+def standard_concentrations():
+    """{chart name: (drug, Preparation)} for every time-mandatory drug in the catalog."""
+    return {
+        f"{entry.name} {preparation_label(preparation)}": (entry.name, preparation)
+        for entry in default_catalog().entries
+        if entry.time_mandatory
+        for preparation in entry.preparations
+    }
+
+
+def concentrations_for(drug):
+    return [name for name, (charted, _) in standard_concentrations().items() if charted == drug]
+
+
+def axis(start, stop, step):
+    """Inclusive, evenly spaced axis without float drift (0.1 + 0.2 ...)."""
+    count = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(count), 6)
+
+
+def rate_chart(name):
+    """(doses, weights, rates) for a standard concentration; rates are mL/hr."""
+    return _rate_chart(*standard_concentrations()[name])
+
+
+@lru_cache(maxsize=None)
+def _rate_chart(drug, preparation):
+    doses = axis(*DOSE_AXES.get(drug, DEFAULT_DOSES))
+    weights = axis(*DEFAULT_WEIGHTS)
+    result = calculate_infusion_batch(
+        drug, doses[:, None], weights[None, :], preparation.amount, preparation.volume_ml, 60.0,
+        stock_unit=preparation.unit,
+    )
+    rates = result.values
+    rates.flags.writeable = False
+    return doses, weights, rates
+
+
+def chart_frame(name, dose_range=None, weight_range=None):
+    """Rate chart as a DataFrame (rows: dose, columns: weight), optionally sliced."""
+    import pandas as pd
+    doses, weights, rates = rate_chart(name)
+    rows = _within(doses, dose_range)
+    cols = _within(weights, weight_range)
+    frame = pd.DataFrame(rates[np.ix_(rows, cols)], index=doses[rows], columns=weights[cols])
+    frame.index.name = "Dose (mcg/kg/min)"
+    frame.columns.name = "Weight (kg)"
+    return frame
+
+
+def chart_csv(frame):
+    return frame.to_csv(float_format="%.2f").encode("utf-8")
+
+
+def _within(values, bounds):
+    if bounds is None:
+        return np.arange(values.size)
+    low, high = bounds
+    return np.flatnonzero((values >= low) & (values <= high))
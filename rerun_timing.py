@@ -0,0 +1,62 @@
+"""Rerun timing for the Streamlit script and its fragments.
+
+``timed_fragment`` turns a function into an ``st.fragment`` that records how
+long each of its reruns takes. Full-script reruns are recorded under
+``FULL_SCRIPT``, which makes the before/after cost of fragment-scoped reruns
+easy to compare in the sidebar.
+"""
+import functools
+import threading
+import time
+from collections import defaultdict, deque
+
+import streamlit as st
+
+from metrics import METRICS
+
+FULL_SCRIPT = "Full script"
+
+
+class RerunStats:
+    def __init__(self, maxlen=500):
+        self._samples = defaultdict(lambda: deque(maxlen=maxlen))
+        self._lock = threading.Lock()
+
+    def record(self, scope, seconds):
+        with self._lock:
+            self._samples[scope].append(seconds)
+        METRICS.observe("rerun_seconds", seconds, scope=scope)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {scope: sorted(values) for scope, values in self._samples.items()}
+        return [
+            {
+                "scope": scope,
+                "runs": len(values),
+                "p50_ms": round(1000 * values[len(values) // 2], 1),
+                "p95_ms": round(1000 * values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+            }
+            for scope, values in sorted(samples.items())
+        ]
+
+
+RERUN_STATS = RerunStats()
+
+
+def timed_fragment(scope, run_every=None):
+    """``st.fragment`` that records the duration of every run under ``scope``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                RERUN_STATS.record(scope, time.perf_counter() - started)
+        return st.fragment(run, run_every=run_every)
+    return decorate
@@ -0,0 +1,193 @@
+"""Similarity cache for Nurse Assistant answers.
+
+Ward questions repeat with different wording ("how do I give dopamine
+safely" / "dopamine administration safety?"). Questions are normalized
+(lowercase, stop words dropped, light stemming, a few ward synonyms) and
+compared as TF-IDF vectors by cosine similarity; a stored answer is served
+when the best match clears ``threshold``. Everything runs offline and in
+memory.
+
+Entries are partitioned by ``scope`` (the catalog drug a question is about)
+and only match questions quoting the same numbers, so a dopamine answer is
+never served for dobutamine and "5 mcg" never for "50 mcg". The cache is
+bounded by entry count with LRU eviction, and entries expire after a TTL.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+STOP_WORDS = frozenset(
+    "a about an and any are as at be before can could do does for from how i if in is it "
+    "me my of on or our please should tell than that the there this to way we what when which who will with "
+    "would you your".split()
+)
+# Stem -> canonical stem for wordings nurses use interchangeably
+SYNONYMS = {
+    "giv": "administ",
+    "given": "administ",
+    "administer": "administ",
+    "administr": "administ",
+    "mix": "prepar",
+    "mak": "prepar",
+    "watch": "monitor",
+    "check": "monitor",
+}
+_SUFFIXES = ("ations", "ation", "ions", "ion", "ings", "ing", "ers", "er", "ied", "ies", "ed", "ly", "ty", "es", "s")
+_TOKEN = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+
+Match = namedtuple("Match", ["answer", "question", "score"])
+
+
+def stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return SYNONYMS.get(word, word)
+
+
+def normalize(question):
+    """(term counts, numbers quoted) of a question, ignoring wording and word order."""
+    terms = Counter()
+    numbers = set()
+    for token in _TOKEN.findall(question.lower()):
+        if token[0].isdigit():
+            numbers.add(float(token))
+            terms[token] += 1
+        elif token not in STOP_WORDS:
+            terms[stem(token)] += 1
+    return terms, frozenset(numbers)
+
+
+class _Entry:
+    __slots__ = ("question", "terms", "numbers", "scope", "answer", "created_at")
+
+    def __init__(self, question, terms, numbers, scope, answer, created_at):
+        self.question = question
+        self.terms = terms
+        self.numbers = numbers
+        self.scope = scope
+        self.answer = answer
+        self.created_at = created_at
+
+
+class SimilarityCache:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> _Entry, least recently used first
+        self._postings = {}  # (scope, term) -> ids
+        self._document_frequency = Counter()
+        self._next_id = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, question, scope=""):
+        """The stored answer of the most similar earlier question, or None."""
+        terms, numbers = normalize(question)
+        with self._lock:
+            best_id, score = self._best(terms, numbers, scope)
+            if best_id is None or score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            return Match(entry.answer, entry.question, score)
+
+    def put(self, question, answer, scope=""):
+        """Store an answer, replacing any earlier question it would have matched."""
+        terms, numbers = normalize(question)
+        if not terms:
+            return
+        with self._lock:
+            while True:
+                best_id, score = self._best(terms, numbers, scope)
+                if best_id is None or score < self.threshold:
+                    break
+                self._remove(best_id)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(question, terms, numbers, scope, answer, time.time())
+            for term in terms:
+                self._postings.setdefault((scope, term), set()).add(entry_id)
+                self._document_frequency[term] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._document_frequency.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    # =========================
+    # Internals (called with the lock held)
+    # =========================
+    def _idf(self, term):
+        return math.log((1 + len(self._entries)) / (1 + self._document_frequency[term])) + 1
+
+    def _vector(self, terms):
+        vector = {term: count * self._idf(term) for term, count in terms.items()}
+        return vector, math.sqrt(sum(w * w for w in vector.values()))
+
+    def _best(self, terms, numbers, scope):
+        """(id, cosine similarity) of the closest live entry in ``scope``."""
+        candidates = set()
+        for term in terms:
+            candidates.update(self._postings.get((scope, term), ()))
+        if not candidates:
+            return None, 0.0
+        query, query_norm = self._vector(terms)
+        expired_before = time.time() - self.ttl_seconds
+        best_id, best_score = None, 0.0
+        for entry_id in sorted(candidates):
+            entry = self._entries[entry_id]
+            if entry.created_at < expired_before:
+                self._remove(entry_id)
+                self.evictions += 1
+                continue
+            if entry.numbers != numbers:
+                continue
+            vector, norm = self._vector(entry.terms)
+            dot = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            score = dot / (query_norm * norm) if query_norm and norm else 0.0
+            if score > best_score:
+                best_id, best_score = entry_id, score
+        return best_id, best_score
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        for term in entry.terms:
+            ids = self._postings[(entry.scope, term)]
+            ids.discard(entry_id)
+            if not ids:
+                del self._postings[(entry.scope, term)]
+            self._document_frequency[term] -= 1
+            if not self._document_frequency[term]:
+                del self._document_frequency[term]
@@ -0,0 +1,150 @@
+"""Single-flight coalescing of identical in-flight LLM calls.
+
+When several sessions ask for the same completion at once (every nurse
+pressing "Generate AI Medication Policy" for the same drug at handover),
+only the first caller talks to the API and the others share its result.
+``call`` does this for blocking calls; ``stream`` for streamed ones, where a
+late joiner first replays the pieces already received and then follows the
+live stream. A key is only shared while its call is in flight; afterwards
+the LLM cache answers. Every caller that joined someone else's call is
+counted in ``llm_coalesced_total{call}``.
+"""
+import threading
+
+from metrics import METRICS
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SharedStreamError(Exception):
+    """A shared stream failed; raised afresh in each reader, caused by the original error."""
+
+
+class _SharedStream:
+    """Thread-safe tee of one stream: whichever reader needs the next piece fetches it."""
+
+    def __init__(self, open_stream, on_idle):
+        self._open_stream = open_stream
+        self._on_idle = on_idle
+        self._source = None
+        self._pieces = []
+        self._fetching = False
+        self._finished = False
+        self._error = None
+        self._readers = 0
+        self._changed = threading.Condition()
+
+    def reader(self):
+        with self._changed:
+            self._readers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(self._pieces):
+                    # Never yield with the lock held: a slow reader must not stall the others
+                    yield self._pieces[position]
+                    position += 1
+                    continue
+                with self._changed:
+                    while position == len(self._pieces) and self._fetching and not self._finished:
+                        self._changed.wait()
+                    if position < len(self._pieces):
+                        continue
+                    if self._finished:
+                        if self._error is not None:
+                            raise SharedStreamError(str(self._error)) from self._error
+                        return
+                    self._fetching = True
+                # The fetch runs unlocked so readers replaying earlier pieces are not held up
+                self._fetch()
+        finally:
+            with self._changed:
+                self._readers -= 1
+                idle = self._finished or not self._readers
+                abandoned = idle and not self._finished
+                source = self._source if abandoned else None
+                if abandoned:
+                    # Nobody holds a position: a caller that joined just now starts over
+                    self._source, self._pieces = None, []
+            if source is not None and hasattr(source, "close"):
+                source.close()
+            if idle:
+                self._on_idle(self)
+
+    def _fetch(self):
+        pieces, finished, error = [], False, None
+        try:
+            if self._source is None:
+                self._source = iter(self._open_stream())
+            pieces.append(next(self._source))
+        except StopIteration:
+            finished = True
+        except Exception as exc:
+            finished, error = True, exc
+        finally:
+            with self._changed:
+                if finished:
+                    self._finished, self._error = True, error
+                self._pieces.extend(pieces)
+                self._fetching = False
+                self._changed.notify_all()
+
+
+class SingleFlight:
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+
+    def call(self, key, fn, label=""):
+        """``fn()``, or the result of the identical call already running under ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            self.metrics.inc("llm_coalesced_total", call=label)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stream(self, key, open_stream, label=""):
+        """Iterator over ``open_stream()``, shared with identical streams in flight under ``key``."""
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is None:
+                shared = self._streams[key] = _SharedStream(open_stream, lambda s: self._forget(key, s))
+            else:
+                self.metrics.inc("llm_coalesced_total", call=label)
+        return shared.reader()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._streams)
+
+    def _forget(self, key, shared):
+        # A finished stream, or one every reader abandoned, takes no new joiners
+        with self._lock:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+
+SINGLE_FLIGHT = SingleFlight()
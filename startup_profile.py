@@ -0,0 +1,99 @@
+"""Cold-start profile of the Streamlit app.
+
+    python startup_profile.py            # import cost per module, then time to first paint
+    python startup_profile.py --top 20
+
+The imports ``app.py`` makes are replayed in a fresh interpreter under
+``python -X importtime``, so every module is measured cold, as on a freshly
+scaled-up container. The app's first script run is then timed through
+Streamlit's ``AppTest``. Heavy dependencies that should stay deferred until
+an AI action or a chart (openai, httpx, pandas, pypdf) are reported when the
+first run loaded them anyway.
+
+The running app records its own first script run per process as the
+``first_paint_seconds`` gauge (``record_first_paint``).
+"""
+import argparse
+import ast
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from metrics import METRICS
+
+APP_PATH = Path(__file__).resolve().with_name("app.py")
+DEFERRED_MODULES = ("openai", "httpx", "pandas", "pypdf")
+
+_first_paint_recorded = False
+
+
+def record_first_paint(seconds, metrics=METRICS):
+    """Record the first full script run of this process; later calls are ignored."""
+    global _first_paint_recorded
+    if not _first_paint_recorded:
+        _first_paint_recorded = True
+        metrics.set("first_paint_seconds", seconds)
+
+
+def app_imports(path=APP_PATH):
+    """Top-level modules imported by ``path``, in order."""
+    modules = []
+    for node in ast.parse(path.read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def import_times(modules):
+    """{module: cumulative seconds} for ``modules`` imported in a fresh interpreter."""
+    code = "\n".join(f"import {name}" for name in modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_PATH.parent, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only first-level entries: nested ones are already in their parent's total
+        if name.startswith(" ") and not name.startswith("  ") and cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return {name: times.get(name, 0.0) for name in modules}
+
+
+def first_paint(path=APP_PATH):
+    """(seconds, deferred modules loaded) for the app's first script run in this process."""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(path), default_timeout=120)
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed, [name for name in DEFERRED_MODULES if name in sys.modules]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the app's cold-start cost.")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args(argv)
+
+    times = import_times(app_imports())
+    print("Import time (cold interpreter, including dependencies)")
+    for name, seconds in sorted(times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<24} {seconds * 1e3:8.1f} ms")
+    print(f"  {'total':<24} {sum(times.values()) * 1e3:8.1f} ms")
+
+    seconds, loaded = first_paint()
+    print(f"\nTime to first paint (first script run): {seconds * 1e3:.1f} ms")
+    if loaded:
+        print(f"Loaded by the first run but meant to be deferred: {', '.join(loaded)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
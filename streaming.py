@@ -0,0 +1,90 @@
+"""Token streaming helpers with latency measurement.
+
+``timed_stream`` wraps a streamed completion so the UI can render it through
+``st.write_stream`` while recording time-to-first-token and total time for
+every call in the process-wide ``STREAM_STATS``.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+StreamTiming = namedtuple("StreamTiming", ["label", "ttft", "total", "chars", "cached"])
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StreamStats:
+    """Rolling window of recent stream timings, grouped by label."""
+
+    def __init__(self, maxlen=1000):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, timing):
+        with self._lock:
+            self._samples.append(timing)
+
+    def recent(self):
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self):
+        grouped = {}
+        for timing in self.recent():
+            grouped.setdefault(timing.label, []).append(timing)
+        rows = []
+        for label, timings in sorted(grouped.items()):
+            ttft = [t.ttft for t in timings]
+            total = [t.total for t in timings]
+            rows.append({
+                "call": label,
+                "count": len(timings),
+                "cached": sum(t.cached for t in timings),
+                "ttft_p50_s": round(_percentile(ttft, 50), 3),
+                "ttft_p95_s": round(_percentile(ttft, 95), 3),
+                "total_p50_s": round(_percentile(total, 50), 3),
+                "total_p95_s": round(_percentile(total, 95), 3),
+            })
+        return rows
+
+
+STREAM_STATS = StreamStats()
+
+
+def iter_deltas(response, on_usage=None):
+    """Yield the text pieces of a ``stream=True`` chat completion.
+
+    With ``stream_options={"include_usage": True}`` the last chunk carries
+    the token counts; it is passed to ``on_usage``.
+    """
+    for chunk in response:
+        if on_usage and getattr(chunk, "usage", None):
+            on_usage(chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def timed_stream(open_stream, label, on_complete=None, cached=False, stats=STREAM_STATS):
+    """Yield text from ``open_stream()`` and record how long it took.
+
+    ``open_stream`` is called lazily so the request itself is inside the
+    measured window. ``on_complete`` receives the full text only if the
+    stream finished without error.
+    """
+    start = time.perf_counter()
+    first = None
+    parts = []
+    for text in open_stream():
+        if first is None:
+            first = time.perf_counter() - start
+        parts.append(text)
+        yield text
+    total = time.perf_counter() - start
+    full_text = "".join(parts)
+    stats.record(StreamTiming(label, total if first is None else first, total, len(full_text), cached))
+    if on_complete:
+        on_complete(full_text)
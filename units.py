@@ -0,0 +1,164 @@
+"""Dimensional analysis for the calculators.
+
+Every unit is reduced to a dimension signature and an exact ``Fraction`` of
+its base unit (mg, mL, minutes, IU, mEq, mmol and kg of body weight):
+"mcg/kg/min" is mass per body weight per time at 1/1000 of mg/kg/min.
+Converting checks that both sides have the same signature, so mg to mL or
+IU to mg raises ``UnitError`` instead of passing the number through.
+
+Factors are applied as ``value * num / den`` with exact integer ratios, so
+1 mcg -> mg divides by 1000 rather than multiplying by an inexact 0.001.
+For arrays the factors of the common spellings come from a precomputed
+table, so a whole column converts with one vectorized multiply and divide.
+"""
+from collections import Counter
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+# name -> (dimension, size in the dimension's base unit)
+SIMPLE_UNITS = {
+    "ng": ("mass", Fraction(1, 1_000_000)),
+    "mcg": ("mass", Fraction(1, 1000)),
+    "ug": ("mass", Fraction(1, 1000)),
+    "µg": ("mass", Fraction(1, 1000)),
+    "mg": ("mass", Fraction(1)),
+    "g": ("mass", Fraction(1000)),
+    "ml": ("volume", Fraction(1)),
+    "l": ("volume", Fraction(1000)),
+    "s": ("time", Fraction(1, 60)),
+    "sec": ("time", Fraction(1, 60)),
+    "seconds": ("time", Fraction(1, 60)),
+    "min": ("time", Fraction(1)),
+    "minute": ("time", Fraction(1)),
+    "minutes": ("time", Fraction(1)),
+    "h": ("time", Fraction(60)),
+    "hr": ("time", Fraction(60)),
+    "hour": ("time", Fraction(60)),
+    "hours": ("time", Fraction(60)),
+    "day": ("time", Fraction(1440)),
+    "days": ("time", Fraction(1440)),
+    # Amounts that cannot be turned into a mass without drug-specific data
+    "iu": ("units", Fraction(1)),
+    "unit": ("units", Fraction(1)),
+    "units": ("units", Fraction(1)),
+    "meq": ("meq", Fraction(1)),
+    "mmol": ("mmol", Fraction(1)),
+    # Patient body weight, as in mcg/kg/min
+    "kg": ("body_weight", Fraction(1)),
+}
+
+# Spellings the UI and order files use; anything else is parsed on demand
+COMMON_SPELLINGS = [
+    *SIMPLE_UNITS, "mL", "L", "IU", "mEq",
+    "mcg/kg/min", "mg/kg/min", "mcg/kg/hr", "mg/kg/hr", "mcg/min", "mg/min", "mg/hr", "mcg/hr",
+    "units/hr", "units/kg/hr", "mL/hr", "mL/min", "mg/kg", "mcg/kg", "mg/mL", "mcg/mL",
+]
+
+
+class UnitError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=1024)
+def parse(unit):
+    """(dimension signature, size in base units) of a unit such as "mcg/kg/min"."""
+    parts = [p.strip() for p in str(unit).lower().split("/")]
+    powers = Counter()
+    size = Fraction(1)
+    for i, part in enumerate(parts):
+        if part not in SIMPLE_UNITS:
+            raise UnitError(f"Unknown unit: {unit!r}")
+        dimension, factor = SIMPLE_UNITS[part]
+        if i == 0:
+            powers[dimension] += 1
+            size *= factor
+        else:
+            powers[dimension] -= 1
+            size /= factor
+    return tuple(sorted((d, p) for d, p in powers.items() if p)), size
+
+
+def ratio(from_unit, to_unit):
+    """(num, den) such that ``value * num / den`` converts ``from_unit`` to ``to_unit``."""
+    if from_unit == to_unit:
+        # Identical units cancel, whatever they are
+        return 1.0, 1.0
+    return _ratio(from_unit, to_unit)
+
+
+@lru_cache(maxsize=1024)
+def _ratio(from_unit, to_unit):
+    from_dims, from_size = parse(from_unit)
+    to_dims, to_size = parse(to_unit)
+    if from_dims != to_dims:
+        raise UnitError(f"Cannot convert {from_unit} to {to_unit}")
+    factor = from_size / to_size
+    return float(factor.numerator), float(factor.denominator)
+
+
+def _ratio_or_nan(from_unit, to_unit):
+    try:
+        return ratio(from_unit, to_unit)
+    except UnitError:
+        return np.nan, np.nan
+
+
+def compatible(from_unit, to_unit):
+    try:
+        ratio(from_unit, to_unit)
+    except UnitError:
+        return False
+    return True
+
+
+def convert(value, from_unit, to_unit):
+    """Scalar conversion; raises ``UnitError`` for unknown or incompatible units."""
+    num, den = ratio(from_unit, to_unit)
+    return value * num / den
+
+
+# =========================
+# Array conversion
+# =========================
+_VOCABULARY = np.array(sorted(set(COMMON_SPELLINGS)), dtype=str)
+_NUM, _DEN = (
+    np.array([[_ratio_or_nan(a, b)[i] for b in _VOCABULARY.tolist()] for a in _VOCABULARY.tolist()])
+    for i in (0, 1)
+)
+
+
+def _codes(units):
+    """Row/column of each unit in the precomputed table, -1 if it is not there."""
+    position = np.searchsorted(_VOCABULARY, units).clip(0, _VOCABULARY.size - 1)
+    return np.where(_VOCABULARY[position] == units, position, -1)
+
+
+def ratio_arrays(from_units, to_units):
+    """Element-wise ``ratio`` over unit arrays (or single units); NaN marks incompatible rows."""
+    from_units = np.asarray(from_units, dtype=str)
+    to_units = np.asarray(to_units, dtype=str)
+    if from_units.ndim == 0 and to_units.ndim == 0:
+        num, den = _ratio_or_nan(str(from_units), str(to_units))
+        return np.float64(num), np.float64(den)
+    from_codes, to_codes = np.broadcast_arrays(_codes(from_units), _codes(to_units))
+    num = _NUM[from_codes, to_codes]
+    den = _DEN[from_codes, to_codes]
+    unknown = (from_codes < 0) | (to_codes < 0)
+    if unknown.any():
+        # Rare spellings: parse each distinct pair once
+        from_units, to_units = np.broadcast_arrays(from_units, to_units)
+        seen = {}
+        for i in zip(*np.nonzero(unknown)):
+            pair = (str(from_units[i]), str(to_units[i]))
+            if pair not in seen:
+                seen[pair] = _ratio_or_nan(*pair)
+            num[i], den[i] = seen[pair]
+    return num, den
+
+
+def convert_array(values, from_units, to_units):
+    """``values`` converted row by row; rows with incompatible units become NaN."""
+    num, den = ratio_arrays(from_units, to_units)
+    return np.asarray(values, dtype=float) * num / den
@@ -0,0 +1,235 @@
+"""Headless bulk verification of medication orders.
+
+Streams a CSV or JSONL file of orders, recomputes every order with the
+batch calculators from ``engine`` in fixed-size chunks, and writes each
+chunk's results and validation flags as soon as it is done. Memory stays
+flat regardless of file size. ``--workers`` spreads chunks over a process
+pool while keeping output in input order.
+
+Each order has a ``type`` column (infusion, parenteral, oral, tablet,
+iv_gravity, iv_pump) plus the inputs of that calculator, named as in the
+UI (dose, weight, stock, volume, time_min, dose_unit, stock_unit,
+drop_factor, time_value, time_unit, volume_unit, time_hours, drug). Unit
+columns are optional and default to mg, mL, minutes (gravity) and hours
+(pump); an infusion without dose_unit takes mcg/kg/min for time-mandatory
+drugs and the stock unit otherwise. An optional
+``expected`` column is compared with the recomputed value. Rows with an
+unknown type get ``error_code`` -1.
+
+    python verify_orders.py orders.csv -o checked.csv --workers 4
+"""
+import argparse
+import csv
+import json
+import math
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from engine import (
+    ERROR_MESSAGES,
+    OK,
+    calculate_infusion_batch,
+    calculate_iv_gravity_batch,
+    calculate_iv_pump_batch,
+    calculate_oral_batch,
+    calculate_parenteral_batch,
+    calculate_tablet_batch,
+)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# type -> (batch calculator, [(field, default)]); a ``str`` default marks a text field
+CALCULATORS = {
+    "infusion": (calculate_infusion_batch, [
+        ("drug", ""), ("dose", None), ("weight", None), ("stock", None), ("volume", None), ("time_min", None),
+        ("dose_unit", ""), ("stock_unit", "mg"),
+    ]),
+    "parenteral": (calculate_parenteral_batch, [
+        ("dose", None), ("stock", None), ("volume", None), ("weight", None), ("dose_unit", "mg"), ("stock_unit", "mg"),
+    ]),
+    "oral": (calculate_oral_batch, [
+        ("dose", None), ("stock", None), ("volume", None), ("weight", None), ("dose_unit", "mg"), ("stock_unit", "mg"),
+    ]),
+    "tablet": (calculate_tablet_batch, [("dose", None), ("stock", None), ("dose_unit", "mg"), ("stock_unit", "mg")]),
+    "iv_gravity": (calculate_iv_gravity_batch, [
+        ("volume", None), ("drop_factor", None), ("time_value", None), ("time_unit", "minutes"), ("volume_unit", "mL"),
+    ]),
+    "iv_pump": (calculate_iv_pump_batch, [
+        ("volume", None), ("time_hours", None), ("time_unit", "hours"), ("volume_unit", "mL"),
+    ]),
+}
+
+RESULT_FIELDS = ["result", "unit", "error_code", "error", "flags"]
+
+
+# =========================
+# Input / output
+# =========================
+def read_orders(path):
+    """Yield orders as dicts, one at a time."""
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if str(path).endswith((".jsonl", ".ndjson")):
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(stream)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class ResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.stream = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        self.jsonl = str(path).endswith((".jsonl", ".ndjson"))
+        self._csv = None
+
+    def write(self, rows):
+        if self.jsonl:
+            self.stream.writelines(json.dumps(row) + "\n" for row in rows)
+            return
+        if self._csv is None and rows:
+            # The header is the union of the first chunk's fields; JSONL rows may differ
+            fields = {}
+            for row in rows:
+                fields.update(dict.fromkeys(f for f in row if f not in RESULT_FIELDS))
+            self._csv = csv.DictWriter(self.stream, fieldnames=list(fields) + RESULT_FIELDS)
+            self._csv.writeheader()
+        for row in rows:
+            extra = row.keys() - self._csv.fieldnames
+            if extra:
+                raise ValueError(
+                    f"Order has fields not in the CSV header: {', '.join(sorted(map(str, extra)))}; "
+                    "write JSONL output or give every order the same fields"
+                )
+        self._csv.writerows(rows)
+        self.stream.flush()
+
+    def close(self):
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+# =========================
+# Verification
+# =========================
+def _number(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _column(orders, field, default):
+    if isinstance(default, str):
+        return np.array([str(o.get(field) or default) for o in orders])
+    return np.array([_number(o.get(field)) for o in orders], dtype=float)
+
+
+def verify_chunk(orders, tolerance=0.01):
+    """Recompute one chunk of orders; returns the rows with result columns added."""
+    results = [None] * len(orders)
+    by_type = {}
+    for i, order in enumerate(orders):
+        by_type.setdefault(str(order.get("type", "")).strip().lower(), []).append(i)
+
+    for kind, rows in by_type.items():
+        if kind not in CALCULATORS:
+            for i in rows:
+                results[i] = (None, "", -1, f"Unknown order type: {kind!r}")
+            continue
+        calculate, fields = CALCULATORS[kind]
+        subset = [orders[i] for i in rows]
+        values, units, errors = calculate(*(_column(subset, f, d) for f, d in fields))
+        for i, value, unit, error in zip(rows, values.tolist(), units.tolist(), errors.tolist()):
+            results[i] = (None if error != OK else value, unit, error, ERROR_MESSAGES[error])
+
+    checked = []
+    for order, (value, unit, error, message) in zip(orders, results):
+        flags = []
+        if error != OK:
+            flags.append("error")
+        else:
+            expected = _number(order.get("expected"))
+            # The slack keeps a difference of exactly the tolerance (13.12 vs 13.13) from
+            # failing on float error
+            if expected is not None and not abs(value - expected) <= tolerance + 1e-9:
+                flags.append("mismatch")
+            if unit == "tablet(s)" and value % 1:
+                flags.append("fractional_tablet")
+        row = dict(order)
+        row.update(result=value, unit=unit, error_code=error, error=message, flags=";".join(flags))
+        checked.append(row)
+    return checked
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def verify_stream(orders, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, tolerance=0.01):
+    """Yield verified chunks in input order, with at most ~2×workers chunks in memory."""
+    chunks = chunked(orders, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield verify_chunk(chunk, tolerance)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(verify_chunk, chunk, tolerance))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute and flag a file of medication orders.")
+    parser.add_argument("orders", help="CSV or JSONL file of orders ('-' for CSV on stdin)")
+    parser.add_argument("-o", "--output", default="-", help="CSV or JSONL output file (default: stdout as CSV)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to spread chunks over (pays off once per-row work outweighs CSV parsing)")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="allowed absolute difference from the 'expected' column")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    writer = ResultWriter(args.output)
+    total = errors = mismatches = 0
+    try:
+        for rows in verify_stream(read_orders(args.orders), args.chunk_size, args.workers, args.tolerance):
+            writer.write(rows)
+            total += len(rows)
+            errors += sum("error" in row["flags"].split(";") for row in rows)
+            mismatches += sum("mismatch" in row["flags"].split(";") for row in rows)
+    except ValueError as exc:
+        print(f"verify_orders: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{total} orders verified in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f}/s): "
+        f"{errors} with errors, {mismatches} mismatches",
+        file=sys.stderr,
+    )
+    return 1 if errors or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
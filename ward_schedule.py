@@ -0,0 +1,217 @@
+"""Ward-level syringe scheduling: when does each running infusion need a new syringe?
+
+``WardSchedule`` tracks every active infusion on a ward (bed, drug,
+preparation, pump rate and volume left) and keeps the time each syringe
+runs empty in a binary heap. Entries are never updated in place: a rate
+change, refill or stop bumps the bed's version and pushes a new entry
+(O(log n)), and stale entries are skipped when the heap is read and
+compacted once they outnumber the live ones. The ward is never recomputed
+as a whole, so a 40-bed board with frequent titrations stays cheap.
+
+Volumes are settled lazily: each infusion stores the volume left at the
+time of its last change and derives the current volume from its rate.
+The schedule lives in memory for one process.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import namedtuple
+
+from units import parse, ratio
+
+BoardRow = namedtuple(
+    "BoardRow", ["bed", "drug", "preparation", "rate_ml_hr", "remaining_ml", "runs_out_at", "minutes_left"]
+)
+
+
+class Infusion:
+    __slots__ = ("bed", "drug", "amount", "unit", "volume_ml", "rate_ml_hr", "remaining_ml", "since", "version")
+
+    def __init__(self, bed, drug, amount, unit, volume_ml, rate_ml_hr, remaining_ml, since):
+        self.bed = bed
+        self.drug = drug
+        self.amount = amount
+        self.unit = unit
+        self.volume_ml = volume_ml
+        self.rate_ml_hr = rate_ml_hr
+        self.remaining_ml = remaining_ml
+        self.since = since
+        self.version = 0
+
+    @property
+    def preparation(self):
+        return f"{self.amount:g} {self.unit} in {self.volume_ml:g} mL"
+
+    def remaining_at(self, now):
+        return max(0.0, self.remaining_ml - self.rate_ml_hr * (now - self.since) / 3600)
+
+    def runs_out_at(self):
+        """Epoch seconds when the syringe is empty; ``inf`` while paused."""
+        if self.rate_ml_hr <= 0:
+            return math.inf
+        return self.since + self.remaining_ml / self.rate_ml_hr * 3600
+
+    def settle(self, now):
+        self.remaining_ml = self.remaining_at(now)
+        self.since = now
+
+
+def rate_ml_per_hour(dose, dose_unit, amount, amount_unit, volume_ml, weight=None):
+    """Pump rate for a dose such as 5 mcg/kg/min of ``amount`` in ``volume_ml``.
+
+    Raises ``units.UnitError`` when the dose and the preparation do not
+    share a unit family (e.g. IU/hr against a syringe made up in mg).
+    """
+    per_kg = ("body_weight", -1) in parse(dose_unit)[0]
+    if per_kg and not weight:
+        raise ValueError("A weight-based dose needs the patient's weight")
+    num, den = ratio(dose_unit, f"{amount_unit}/kg/hr" if per_kg else f"{amount_unit}/hr")
+    per_hour = dose * num / den * (weight if per_kg else 1.0)
+    return per_hour * volume_ml / amount
+
+
+class WardSchedule:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._infusions = {}
+        self._heap = []  # (runs_out_at, bed, version)
+        # Versions are unique across beds, so a stopped and restarted bed never revives old entries
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._infusions)
+
+    def __contains__(self, bed):
+        return bed in self._infusions
+
+    # =========================
+    # Updates, O(log n) each
+    # =========================
+    def start(self, bed, drug, amount, unit, volume_ml, rate_ml_hr, remaining_ml=None, now=None):
+        """A new syringe on ``bed`` (replacing whatever ran there); full unless ``remaining_ml`` is given."""
+        now = self.clock() if now is None else now
+        infusion = Infusion(bed, drug, float(amount), unit, float(volume_ml), float(rate_ml_hr),
+                            float(volume_ml if remaining_ml is None else remaining_ml), now)
+        with self._lock:
+            infusion.version = next(self._versions)
+            self._infusions[bed] = infusion
+            self._push(infusion)
+        return infusion
+
+    def set_rate(self, bed, rate_ml_hr, now=None):
+        """Titrate ``bed``: the volume used so far is settled at the old rate.
+
+        Returns None when nothing is running on ``bed`` (another session stopped it).
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            infusion = self._infusions.get(bed)
+            if infusion is None:
+                return None
+            infusion.settle(now)
+            infusion.rate_ml_hr = float(rate_ml_hr)
+            infusion.version = next(self._versions)
+            self._push(infusion)
+        return infusion
+
+    def replace_syringe(self, bed, remaining_ml=None, now=None):
+        """Same preparation and rate, new syringe; None when nothing is running on ``bed``."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            infusion = self._infusions.get(bed)
+            if infusion is None:
+                return None
+            infusion.remaining_ml = infusion.volume_ml if remaining_ml is None else float(remaining_ml)
+            infusion.since = now
+            infusion.version = next(self._versions)
+            self._push(infusion)
+        return infusion
+
+    def stop(self, bed):
+        with self._lock:
+            # Its heap entries go stale and are dropped when reached
+            self._infusions.pop(bed, None)
+
+    def get(self, bed):
+        return self._infusions.get(bed)
+
+    def beds(self):
+        with self._lock:
+            return sorted(self._infusions, key=str)
+
+    # =========================
+    # Board
+    # =========================
+    def next_changes(self, limit=10, now=None):
+        """The ``limit`` syringes that run out first, soonest first, as ``BoardRow``s."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            live = self._take(lambda count, runs_out_at: count < limit)
+        return [self._row(infusion, runs_out_at, now) for runs_out_at, infusion in live]
+
+    def due_within(self, seconds, now=None):
+        """Every syringe that runs out within ``seconds`` from now (overdue ones included)."""
+        now = self.clock() if now is None else now
+        horizon = now + seconds
+        with self._lock:
+            live = self._take(lambda count, runs_out_at: runs_out_at <= horizon)
+        return [self._row(infusion, runs_out_at, now) for runs_out_at, infusion in live]
+
+    def prep_plan(self, hours, now=None):
+        """{preparation: syringes to prepare} to keep every running infusion going for ``hours``."""
+        now = self.clock() if now is None else now
+        plan = {}
+        with self._lock:
+            infusions = list(self._infusions.values())
+        for infusion in infusions:
+            shortfall = infusion.rate_ml_hr * hours - infusion.remaining_at(now)
+            if shortfall > 0:
+                key = (infusion.drug, infusion.preparation)
+                plan[key] = plan.get(key, 0) + math.ceil(shortfall / infusion.volume_ml)
+        return plan
+
+    # =========================
+    # Heap internals (called with the lock held)
+    # =========================
+    def _push(self, infusion):
+        runs_out_at = infusion.runs_out_at()
+        if runs_out_at != math.inf:
+            heapq.heappush(self._heap, (runs_out_at, infusion.bed, infusion.version))
+        # Rebuild once stale entries dominate, so the heap stays O(beds)
+        if len(self._heap) > 2 * len(self._infusions) + 64:
+            self._heap = [
+                (runs_out_at, bed, version) for runs_out_at, bed, version in self._heap
+                if self._is_live(bed, version)
+            ]
+            heapq.heapify(self._heap)
+
+    def _is_live(self, bed, version):
+        infusion = self._infusions.get(bed)
+        return infusion is not None and infusion.version == version
+
+    def _take(self, keep_going):
+        """Pop live entries in order while ``keep_going(count, runs_out_at)``, then put them back."""
+        live = []
+        while self._heap and keep_going(len(live), self._heap[0][0]):
+            entry = heapq.heappop(self._heap)
+            runs_out_at, bed, version = entry
+            if self._is_live(bed, version):
+                live.append((runs_out_at, self._infusions[bed], entry))
+        for *_, entry in live:
+            heapq.heappush(self._heap, entry)
+        return [(runs_out_at, infusion) for runs_out_at, infusion, _ in live]
+
+    @staticmethod
+    def _row(infusion, runs_out_at, now):
+        return BoardRow(
+            bed=infusion.bed,
+            drug=infusion.drug,
+            preparation=infusion.preparation,
+            rate_ml_hr=infusion.rate_ml_hr,
+            remaining_ml=round(infusion.remaining_at(now), 1),
+            runs_out_at=runs_out_at,
+            minutes_left=round((runs_out_at - now) / 60, 1),
+        )